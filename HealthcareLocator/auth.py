@@ -1,22 +1,48 @@
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+from cachetools import TLRUCache
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 import models
+from metrics import section, timed
+from password_hashing import hash_password, verify_and_update
 
 # Security constants
-SECRET_KEY = "your-secret-key-here"  # Should be stored in environment variables
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # Set SECRET_KEY in production
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Verified tokens kept in memory, each until it expires or at most this long
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
 
+@dataclass(frozen=True)
+class TokenIdentity:
+    """Verified claims of an access token and the patient they belong to"""
+    patient_id: int
+    email: str
+    jti: Optional[str]
+    expires_at: float
+
+def _token_expiry(token, identity, now):
+    return min(identity.expires_at, now + TOKEN_CACHE_TTL)
+
+_token_cache = TLRUCache(maxsize=TOKEN_CACHE_SIZE, ttu=_token_expiry, timer=time.time)
+_revoked = {}  # jti -> expiry timestamp
+_token_lock = threading.Lock()
+
+# bcrypt runs in the worker pool of password_hashing, off the script thread
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    valid, _ = verify_and_update(plain_password, hashed_password)
+    return valid
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hash_password(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -24,16 +50,79 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_access_token(token: str) -> Optional[dict]:
+    """Claims of a validly signed, unexpired token, or None"""
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+
+def verify_access_token(token: Optional[str]) -> Optional[TokenIdentity]:
+    """Identity behind an access token, or None if it is invalid, expired, revoked or its patient is gone.
+
+    The first verification decodes the token and looks the patient up; later
+    calls with the same token are served from memory until the token
+    expires, is revoked, or TOKEN_CACHE_TTL elapses.
+    """
+    if not token:
+        return None
+    with _token_lock:
+        identity = _token_cache.get(token)
+    if identity is not None:
+        return identity
+
+    claims = decode_access_token(token)
+    if not claims or is_revoked(claims.get("jti")):
+        return None
+
+    from database import session_scope
+    with section("verify_token_query"), session_scope() as db:
+        patient = db.query(models.Patient).filter(models.Patient.email == claims.get("sub")).first()
+        if not patient or patient.is_active is False:
+            return None
+        identity = TokenIdentity(patient.id, patient.email, claims.get("jti"), float(claims["exp"]))
+
+    with _token_lock:
+        _token_cache[token] = identity
+    return identity
+
+def revoke_token(token: Optional[str]):
+    """Reject a token from now on, e.g. at logout.
+
+    Revocations live in this process's memory, which is where the Streamlit
+    session holding the token is served.
+    """
+    claims = decode_access_token(token) if token else None
+    with _token_lock:
+        _token_cache.pop(token, None)
+        if claims and claims.get("jti"):
+            now = time.time()
+            # Expired tokens fail verification anyway, so forget their revocations
+            for jti, expires_at in list(_revoked.items()):
+                if expires_at < now:
+                    del _revoked[jti]
+            _revoked[claims["jti"]] = float(claims["exp"])
+
+def is_revoked(jti: Optional[str]) -> bool:
+    with _token_lock:
+        return jti in _revoked
+
+@timed("authenticate_patient")
 def authenticate_patient(db: Session, email: str, password: str):
     patient = db.query(models.Patient).filter(models.Patient.email == email).first()
     if not patient:
         return False
-    if not verify_password(password, patient.hashed_password):
+    valid, new_hash = verify_and_update(password, patient.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        # Stored hash used outdated parameters; upgrade it while we have the password
+        patient.hashed_password = new_hash
+        db.commit()
     return patient
 
 def create_patient(
@@ -0,0 +1,227 @@
+# Benchmarks for the data loading, filtering and map rendering hot paths.
+#
+# Generates synthetic Hospitals.csv files at several sizes, times what main.py
+# runs on every rerun and writes the timings as JSON. Comparing against an
+# earlier run exits with status 1 when anything slowed down:
+#
+#   python benchmark.py --output baseline.json
+#   python benchmark.py --baseline baseline.json --output current.json
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import folium
+import numpy as np
+import pandas as pd
+from data_cache import compact_facilities, memory_mb
+from filter_index import build_filter_index
+from map_layers import MAP_CENTER, MAP_ZOOM, MAX_MARKERS, add_clustered_facilities, add_facility_markers
+from stats_cube import build_stats_cube, cube_facility_stats
+from utils import BOOL_COLUMNS, build_location_hierarchy, filter_facilities, get_facility_stats, load_and_clean_data
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# A benchmark regresses when it is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.2
+# ...and slower by at least this many seconds, so timer noise on tiny
+# benchmarks is not reported
+MIN_REGRESSION_SECONDS = 0.002
+
+# Sidebar filter combinations timed against filter_facilities
+FILTER_CASES = {
+    'no_filters': {},
+    'state': {'state': "Lagos"},
+    'state_lga': {'state': "Lagos", 'lga': "Lagos LGA 3"},
+    'type_services': {
+        'facility_type': "Primary Health Centre (PHC)",
+        'services': ["Maternal Health", "Malaria Treatment"]
+    },
+    'search': {'search_term': "general"},
+    'combined': {
+        'state': "Kano",
+        'facility_type': "Primary Health Centre (PHC)",
+        'services': ["Family Planning"],
+        'search_term': "kano"
+    },
+}
+
+STATES = [
+    "Abia", "Adamawa", "Akwa Ibom", "Anambra", "Bauchi", "Bayelsa", "Benue", "Borno",
+    "Cross River", "Delta", "Ebonyi", "Edo", "Ekiti", "Enugu", "Federal Capital Territory",
+    "Gombe", "Imo", "Jigawa", "Kaduna", "Kano", "Katsina", "Kebbi", "Kogi", "Kwara", "Lagos",
+    "Nasarawa", "Niger", "Ogun", "Ondo", "Osun", "Oyo", "Plateau", "Rivers", "Sokoto",
+    "Taraba", "Yobe", "Zamfara",
+]
+FACILITY_TYPES = {
+    'Primary Health Centre (PHC)': 0.55,
+    'Health Post': 0.2,
+    'Dispensary': 0.15,
+    'District / General Hospital': 0.08,
+    'Teaching / Specialist Hospital': 0.02,
+}
+NAME_WORDS = ["General", "Community", "Model", "Comprehensive", "Maternal", "Central", "Township", "Mission"]
+
+
+def synthetic_facilities(rows, seed=0):
+    """A raw facility frame shaped like Hospitals.csv, including the dirty rows cleaning drops."""
+    rng = np.random.default_rng(seed)
+    states = rng.choice(STATES, rows)
+    lgas = np.char.add(np.char.add(states, " LGA "), rng.integers(1, 21, rows).astype(str))
+    words = rng.choice(NAME_WORDS, rows)
+    names = [f"{state} {word} Health Centre {i}" for i, (state, word) in enumerate(zip(states, words))]
+
+    latitude = rng.uniform(4.3, 13.9, rows).round(6).astype(object)
+    longitude = rng.uniform(2.7, 14.7, rows).round(6).astype(object)
+    # About 1% missing or unparseable coordinates
+    latitude[rng.random(rows) < 0.005] = ""
+    longitude[rng.random(rows) < 0.005] = "n/a"
+
+    df = pd.DataFrame({
+        'facility_name': names,
+        'facility_type_display': rng.choice(list(FACILITY_TYPES), rows, p=list(FACILITY_TYPES.values())),
+        'State': states,
+        'Local_Government_Area': lgas,
+        'latitude': latitude,
+        'longitude': longitude,
+    })
+    for column in BOOL_COLUMNS:
+        df[column] = rng.choice(["TRUE", "FALSE", ""], rows, p=[0.5, 0.35, 0.15])
+    return df
+
+
+def synthetic_csv(rows, directory, seed=0):
+    """Path of a synthetic CSV with the given number of rows, generated on first use."""
+    path = os.path.join(directory, f"facilities-{rows}-{seed}.csv")
+    if not os.path.exists(path):
+        synthetic_facilities(rows, seed).to_csv(path, index=False)
+    return path
+
+
+def timed(func, repeat):
+    """Run func repeat times; returns the timings summary and the last result."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - start)
+    return {
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'repeat': repeat,
+    }, result
+
+
+def render_map(df, clustered):
+    """Build the facilities map as main.py does and render it to HTML."""
+    m = folium.Map(location=MAP_CENTER, zoom_start=MAP_ZOOM, width=800, height=600)
+    layer = folium.FeatureGroup(name="Facilities")
+    if clustered:
+        add_clustered_facilities(layer, df, zoom=MAP_ZOOM)
+    else:
+        add_facility_markers(layer, df, limit=MAX_MARKERS)
+    layer.add_to(m)
+    return m.get_root().render()
+
+
+def run_size(rows, directory, repeat):
+    """Timings of every benchmark on a synthetic dataset of the given size, and its memory in MB."""
+    # Fewer repetitions as the dataset grows keep a full run in minutes
+    repeat = max(1, repeat if rows <= 100_000 else repeat // 3)
+    csv_path = synthetic_csv(rows, directory)
+    results = {}
+
+    def bench(name, func, times=repeat):
+        results[name], value = timed(func, times)
+        print(f"  {name:<40} {results[name]['min'] * 1000:10.1f} ms", flush=True)
+        return value
+
+    print(f"{rows:,} rows")
+    cleaned = bench("load_and_clean_data", lambda: load_and_clean_data(csv_path), times=max(1, repeat // 2))
+    # The app serves the compacted frame (see data_cache.py)
+    df = bench("compact_facilities", lambda: compact_facilities(cleaned))
+    memory = {'cleaned': memory_mb(cleaned), 'compact': memory_mb(df)}
+    print(f"  {'memory (cleaned -> compact)':<40} {memory['cleaned']:7.1f} MB -> {memory['compact']:.1f} MB")
+    bench("build_location_hierarchy", lambda: build_location_hierarchy(df))
+    bench("get_facility_stats", lambda: get_facility_stats(df))
+
+    for case, filters in FILTER_CASES.items():
+        bench(f"filter_facilities[{case}]", lambda: filter_facilities(df, **filters))
+
+    index = bench("build_filter_index", lambda: build_filter_index(df), times=max(1, repeat // 2))
+    for case, filters in FILTER_CASES.items():
+        bench(f"filter_facilities_indexed[{case}]", lambda: filter_facilities(df, index=index, **filters))
+
+    cube = bench("build_stats_cube", lambda: build_stats_cube(df))
+    bench("cube_facility_stats", lambda: cube_facility_stats(cube, state="Lagos", services=["Maternal Health"]))
+
+    bench("render_map[clustered]", lambda: render_map(df, clustered=True))
+    bench("render_map[markers]", lambda: render_map(df, clustered=False))
+    return results, memory
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """(name, baseline_s, current_s, ratio) for benchmarks slower than the baseline by more than threshold."""
+    regressions = []
+    for size, benchmarks in current['results'].items():
+        for name, timing in benchmarks.items():
+            before = baseline.get('results', {}).get(size, {}).get(name)
+            if before is None:
+                continue
+            ratio = timing['min'] / before['min'] if before['min'] > 0 else float("inf")
+            if ratio > 1 + threshold and timing['min'] - before['min'] >= MIN_REGRESSION_SECONDS:
+                regressions.append((f"{name} @ {int(size):,} rows", before['min'], timing['min'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the data and rendering hot paths on synthetic datasets.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated dataset sizes in rows")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (minimum is reported)")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "locator-benchmarks"),
+                        help="where the synthetic CSV files are generated and reused")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown reported as a regression (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+        },
+        'results': {},
+        'memory_mb': {},
+    }
+    for rows in sizes:
+        report['results'][str(rows)], report['memory_mb'][str(rows)] = run_size(rows, args.data_dir, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+import glob
+import hashlib
+import logging
+import os
+import sys
+from collections import deque
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from pools import process_pool
+from utils import BOOL_COLUMNS, FACILITY_ID_COLUMN, clean_facility_chunk
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the cleaned-dataset cache files
+CACHE_DIR = os.getenv("DATA_CACHE_DIR", ".cache")
+
+# Bump when the cleaning rules change so existing cache files are rebuilt
+CACHE_FORMAT = 3
+
+# Rows parsed at a time when loading a CSV; bounds peak memory while loading
+LOAD_CHUNK_SIZE = int(os.getenv("LOAD_CHUNK_SIZE", "200000"))
+
+# Processes cleaning chunks in parallel (0 cleans them in the loading process)
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "0"))
+
+# The columns the app reads and their in-memory types; every other CSV column
+# is dropped. Low-cardinality text is dictionary-encoded, names and ids are
+# kept in Arrow string buffers rather than Python objects, and float32 keeps
+# coordinates to within about a metre.
+FACILITY_SCHEMA = {
+    FACILITY_ID_COLUMN: pd.StringDtype("pyarrow"),
+    'facility_name': pd.StringDtype("pyarrow"),
+    'facility_type_display': 'category',
+    'State': 'category',
+    'Local_Government_Area': 'category',
+    'latitude': 'float32',
+    'longitude': 'float32',
+    **{col: 'boolean' for col in BOOL_COLUMNS},
+}
+
+# Arrow types read back as the pandas types of FACILITY_SCHEMA
+ARROW_TYPES = {
+    pa.string(): pd.StringDtype("pyarrow"),
+    pa.large_string(): pd.StringDtype("pyarrow"),
+    pa.bool_(): pd.BooleanDtype(),
+}
+
+
+# (path, size, mtime) -> version, so unchanged files are hashed only once
+_versions = {}
+
+
+def dataset_version(file_path):
+    """Identify a CSV by its content hash and modification time."""
+    stat = os.stat(file_path)
+    key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    if key not in _versions:
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(str(stat.st_mtime_ns).encode())
+        _versions[key] = digest.hexdigest()[:16]
+    return _versions[key]
+
+
+def memory_mb(df):
+    """Memory held by a frame, including the Python strings in object columns."""
+    return df.memory_usage(deep=True).sum() / 2**20
+
+
+def _project(df):
+    return df[list(FACILITY_SCHEMA)].astype(FACILITY_SCHEMA).reset_index(drop=True)
+
+
+def compact_facilities(df):
+    """Project a cleaned facility frame onto FACILITY_SCHEMA."""
+    before = memory_mb(df)
+    compact = _project(df)
+    logger.info(f"Compacted {len(compact):,} facilities from {before:.1f} MB to {memory_mb(compact):.1f} MB")
+    return compact
+
+
+def _compact_chunk(raw):
+    return _project(clean_facility_chunk(raw))
+
+
+def _csv_paths(paths):
+    """One path, glob pattern or list of them as a list of files."""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    return [match for path in paths for match in (sorted(glob.glob(os.fspath(path))) or [path])]
+
+
+def read_raw_chunks(paths, chunksize):
+    """Raw facility rows of the given files, chunk by chunk, ready for clean_facility_chunk."""
+    for path in paths:
+        # Only the schema's columns are parsed, all as text; cleaning converts
+        # them, so malformed values cannot change a chunk's dtypes.
+        # Compression (.gz, .bz2, .zip, .xz, .zst) follows the file extension.
+        yield from pd.read_csv(path, usecols=lambda col: col in FACILITY_SCHEMA, dtype=str, chunksize=chunksize)
+
+
+def _compacted_chunks(chunks, workers):
+    if workers <= 0:
+        for raw in chunks:
+            yield _compact_chunk(raw)
+        return
+    with process_pool(workers) as pool:
+        # At most two chunks per worker in flight, so a slow pool does not
+        # let raw chunks pile up in memory
+        pending = deque()
+        for raw in chunks:
+            pending.append(pool.submit(_compact_chunk, raw))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _concat_compact(parts):
+    """Concatenate compacted chunks, keeping the categoricals."""
+    if not parts:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in FACILITY_SCHEMA.items()})
+    for col, dtype in FACILITY_SCHEMA.items():
+        if dtype == 'category':
+            # Chunks see different categories; concat keeps the dtype only when they agree
+            categories = pd.Index(sorted(set().union(*(part[col].cat.categories for part in parts))))
+            for part in parts:
+                part[col] = part[col].cat.set_categories(categories)
+    return pd.concat(parts, ignore_index=True)
+
+
+def stream_facilities(paths, chunksize=LOAD_CHUNK_SIZE, workers=LOAD_WORKERS):
+    """Load, clean and compact one or more facility CSVs chunk by chunk.
+
+    Peak memory is the compacted result plus a few raw chunks rather than the
+    whole file as parsed, so national extracts load within a fixed budget.
+    ``paths`` may be a path, a glob pattern or a list of them; rows keep the
+    order of the files and of the rows within them.
+    """
+    files = _csv_paths(paths)
+    parts = list(_compacted_chunks(read_raw_chunks(files, chunksize), workers))
+    df = _concat_compact(parts)
+    logger.info(f"Loaded {len(df):,} facilities from {len(files)} file(s) ({memory_mb(df):.1f} MB)")
+    return df
+
+
+def write_arrow(df, path):
+    """Write a frame as an uncompressed Arrow IPC file, atomically."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # Uncompressed so that readers can memory-map the buffers directly
+    feather.write_feather(df, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+
+
+def read_arrow(path):
+    """Read an Arrow IPC file through a memory map."""
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(types_mapper=ARROW_TYPES.get)
+
+
+def load_cached_data(file_path, cache_dir=CACHE_DIR):
+    """Load the cleaned dataset, reusing the Arrow cache when the CSV is unchanged."""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    cache_path = os.path.join(cache_dir, f"{stem}-{dataset_version(file_path)}-v{CACHE_FORMAT}.arrow")
+
+    if os.path.exists(cache_path):
+        try:
+            return read_arrow(cache_path)
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f"Ignoring unreadable dataset cache {cache_path}: {str(e)}")
+
+    df = stream_facilities(file_path)
+    try:
+        write_arrow(df, cache_path)
+        # Drop caches of earlier versions of the same CSV
+        for stale in glob.glob(os.path.join(cache_dir, f"{stem}-*.arrow")):
+            if stale != cache_path:
+                os.remove(stale)
+    except OSError as e:
+        logger.warning(f"Could not write dataset cache {cache_path}: {str(e)}")
+    return df
+
+
+def memory_report(file_path):
+    """Per-column memory (MB) of the dataset as read, as cleaned and as compacted."""
+    raw = pd.read_csv(file_path)
+    cleaned = clean_facility_chunk(raw.copy())
+    compact = compact_facilities(cleaned)
+    report = pd.DataFrame({
+        'raw': raw.memory_usage(deep=True, index=False),
+        'cleaned': cleaned.memory_usage(deep=True, index=False),
+        'compact': compact.memory_usage(deep=True, index=False),
+    }) / 2**20
+    report.loc['total'] = report.sum()
+    return report
+
+
+if __name__ == "__main__":
+    # python data_cache.py report [path/to/Hospitals.csv]
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:2] == ["report"]:
+        path = sys.argv[2] if len(sys.argv) > 2 else "attached_assets/Hospitals.csv"
+        print(memory_report(path).round(2).fillna("-").to_string())
+    else:
+        sys.exit("Usage: python data_cache.py report [csv_path]")
@@ -1,8 +1,15 @@
 import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
 from models import Base
+from migrations import run_migrations
+import metrics
 import time
 import logging
 
@@ -15,20 +22,101 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://")
 
-def get_engine(max_retries=3, initial_delay=1):
+# Connection pool sizing, overridable per deployment
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# The schema is created and migrated by a deploy step (python -m migrations);
+# set to "true" to have each process do it on first use instead
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "false").lower() == "true"
+
+# Engines are created on first use, once per process
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+# Sessions are bound to the engine when they are opened
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# Connection pool counters, updated from pool events
+_pool_stats = {
+    'checkouts': 0,
+    'checkins': 0,
+    'checked_out': 0,
+    'peak_checked_out': 0,
+    'timeouts': 0,
+}
+_pool_stats_lock = threading.Lock()
+
+# First table a statement reads or writes, used to label query timings
+_STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+"?(\w+)', re.IGNORECASE)
+
+def connect(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+    metrics.increment("db_connections_opened_total")
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('query_start')
+    if not started:
+        return
+    table = _STATEMENT_TABLE.search(statement)
+    metrics.observe(
+        "db_query_seconds",
+        time.perf_counter() - started.pop(),
+        operation=statement.split(None, 1)[0].upper() if statement.strip() else "",
+        table=table.group(1).lower() if table else ""
+    )
+
+def handle_error(exception_context):
+    # after_cursor_execute does not run for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_start'):
+        conn.info['query_start'].pop()
+    metrics.increment("db_query_errors_total")
+
+def _listen_for_queries(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+def checkout(dbapi_connection, connection_record, connection_proxy):
+    with _pool_stats_lock:
+        _pool_stats['checkouts'] += 1
+        _pool_stats['checked_out'] += 1
+        _pool_stats['peak_checked_out'] = max(_pool_stats['peak_checked_out'], _pool_stats['checked_out'])
+
+def checkin(dbapi_connection, connection_record):
+    with _pool_stats_lock:
+        _pool_stats['checkins'] += 1
+        _pool_stats['checked_out'] -= 1
+
+def _create_engine(max_retries=3, initial_delay=1):
     """Create database engine with exponential backoff retry logic"""
     for attempt in range(max_retries):
         try:
             engine = create_engine(
                 DATABASE_URL,
                 pool_pre_ping=True,
-                pool_size=5,
-                max_overflow=10,
+                pool_size=DB_POOL_SIZE,
+                max_overflow=DB_MAX_OVERFLOW,
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_recycle=DB_POOL_RECYCLE,
                 connect_args={
                     "sslmode": "prefer",  # Changed from require to prefer
                     "connect_timeout": 10
                 }
             )
+            event.listen(engine, "connect", connect)
+            event.listen(engine, "checkout", checkout)
+            event.listen(engine, "checkin", checkin)
+            _listen_for_queries(engine)
 
             # Test connection
             with engine.connect() as conn:
@@ -47,30 +135,123 @@ def get_engine(max_retries=3, initial_delay=1):
                 raise
             time.sleep(delay)
 
-# Create engine
-try:
-    engine = get_engine()
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-except Exception as e:
-    logger.error(f"Failed to create database engine: {str(e)}")
-    raise
+def get_engine():
+    """Return the process-wide engine, connecting on first use.
 
-@event.listens_for(engine, "connect")
-def connect(dbapi_connection, connection_record):
-    connection_record.info['pid'] = os.getpid()
+    Nothing touches the database at import time, so pages that never use it
+    (the public map) never wait on it.
+    """
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine()
+    return _engine
+
+def get_async_engine():
+    """Return the process-wide asyncio engine (requires the asyncpg package)."""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        # asyncpg takes its SSL and timeout settings as connect arguments
+        url = make_url(DATABASE_URL).set(drivername="postgresql+asyncpg")
+        url = url.difference_update_query(["sslmode", "connect_timeout"])
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = create_async_engine(
+                    url,
+                    pool_pre_ping=True,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    pool_recycle=DB_POOL_RECYCLE,
+                    connect_args={"ssl": "prefer", "timeout": 10}
+                )
+                _listen_for_queries(_async_engine.sync_engine)
+    return _async_engine
+
+def get_async_sessionmaker():
+    """Session factory for the asyncio engine."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    return async_sessionmaker(get_async_engine(), expire_on_commit=False)
 
 def init_db():
     """Initialize database schema"""
+    global _schema_ready
     try:
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=get_engine())
+        run_migrations(get_engine())
+        _schema_ready = True
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
 
+def ensure_schema():
+    """Create the schema once per process unless a deploy step owns it."""
+    if _schema_ready or not DB_INIT_ON_STARTUP:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            init_db()
+
+def get_pool_stats():
+    """Pool checkout counters plus the pool's current size and overflow."""
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    if _engine is not None:
+        pool = _engine.pool
+        stats.update(
+            pool_size=pool.size(),
+            overflow=pool.overflow(),
+            idle=pool.checkedin(),
+            max_overflow=DB_MAX_OVERFLOW
+        )
+    return stats
+
+def _pool_gauges():
+    return {f"db_pool_{name}": value for name, value in get_pool_stats().items()}
+
+metrics.register_collector(_pool_gauges)
+
+@contextmanager
+def session_scope():
+    """Unit of work: commit on success, roll back on error, always release the connection.
+
+    Usage:
+        with session_scope() as db:
+            ...
+    """
+    ensure_schema()
+    db = SessionLocal(bind=get_engine())
+    try:
+        yield db
+        db.commit()
+    except PoolTimeoutError:
+        with _pool_stats_lock:
+            _pool_stats['timeouts'] += 1
+        logger.error(f"Timed out waiting for a database connection: {get_pool_stats()}")
+        db.rollback()
+        raise
+    except OperationalError as e:
+        logger.error(f"Database operation failed: {str(e)}")
+        db.rollback()
+        raise
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 def get_db():
-    """Database session generator with error handling"""
-    db = SessionLocal()
+    """Database session generator with error handling.
+
+    The session is only closed when the generator is exhausted or closed;
+    use session_scope() outside of dependency-injection style callers.
+    """
+    ensure_schema()
+    db = SessionLocal(bind=get_engine())
     try:
         yield db
     except OperationalError as e:
@@ -78,4 +259,11 @@ def get_db():
         db.rollback()  # Rollback any failed transaction
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+if __name__ == "__main__":
+    # Deploy step: python database.py [init]; creates tables and applies migrations
+    if sys.argv[1:] in ([], ["init"]):
+        init_db()
+    else:
+        sys.exit(f"Unknown command: {' '.join(sys.argv[1:])}")
@@ -0,0 +1,210 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+
+import numpy as np
+import pandas as pd
+from data_cache import dataset_version, load_cached_data
+from filter_index import build_filter_index
+from shared_dataset import attach_dataset, ensure_published
+from spatial import build_spatial_index
+from stats_cube import build_stats_cube, update_stats_cube
+from utils import FACILITY_ID_COLUMN, build_location_hierarchy, update_location_hierarchy
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the source file for changes
+DATASET_CHECK_INTERVAL = float(os.getenv("DATASET_CHECK_INTERVAL", "10"))
+
+
+@dataclass(frozen=True)
+class DatasetDiff:
+    """Row-level changes between two versions, matched by facility id."""
+    added: int
+    updated: int
+    removed: int
+    inserted: pd.DataFrame  # Rows of the new version that were added or changed
+    deleted: pd.DataFrame   # Rows of the old version that were removed or replaced
+
+    @property
+    def empty(self):
+        return not (self.added or self.updated or self.removed)
+
+
+@dataclass(frozen=True)
+class DatasetSnapshot:
+    """One immutable version of the dataset and everything derived from it."""
+    version: str
+    df: pd.DataFrame
+    row_hashes: np.ndarray
+    spatial_index: object
+    filter_index: object
+    stats_cube: pd.DataFrame
+    locations: object
+    facility_types: list
+    diff: DatasetDiff = None
+
+
+def row_hashes(df):
+    """Content hash of every row, to tell changed rows from unchanged ones."""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def diff_datasets(old, new_df, new_hashes):
+    """Rows added, changed and removed between a snapshot and a new frame.
+
+    Returns None when facility ids are not unique, since rows then cannot be
+    matched across versions.
+    """
+    old_ids = pd.Index(old.df[FACILITY_ID_COLUMN])
+    new_ids = pd.Index(new_df[FACILITY_ID_COLUMN])
+    if not (old_ids.is_unique and new_ids.is_unique):
+        return None
+
+    old_positions = old_ids.get_indexer(new_ids)
+    matched = old_positions >= 0
+    changed = matched & (old.row_hashes[old_positions] != new_hashes)
+    removed = np.flatnonzero(new_ids.get_indexer(old_ids) < 0)
+
+    return DatasetDiff(
+        added=int((~matched).sum()),
+        updated=int(changed.sum()),
+        removed=len(removed),
+        inserted=new_df[~matched | changed],
+        deleted=old.df.iloc[np.concatenate([removed, old_positions[changed]])],
+    )
+
+
+def build_snapshot(version, df, hashes=None, previous=None, diff=None):
+    """Snapshot of df; count-based structures are patched from previous when diff is given.
+
+    The text index, stats cube and location hierarchy are updated from the
+    diff's rows. The spatial index and filter bitsets address rows by
+    position, which any insert or delete shifts, so they are rebuilt (one
+    vectorized pass each).
+    """
+    if hashes is None:
+        hashes = row_hashes(df)
+    patch = previous is not None and diff is not None
+    return DatasetSnapshot(
+        version=version,
+        df=df,
+        row_hashes=hashes,
+        # Positions change with any insert or delete; rebuilding is cheap
+        spatial_index=build_spatial_index(df),
+        filter_index=build_filter_index(df, previous.filter_index if patch else None),
+        stats_cube=(
+            update_stats_cube(previous.stats_cube, diff.deleted, diff.inserted) if patch
+            else build_stats_cube(df)
+        ),
+        locations=(
+            update_location_hierarchy(previous.locations, diff.deleted, diff.inserted) if patch
+            else build_location_hierarchy(df)
+        ),
+        facility_types=sorted(df['facility_type_display'].dropna().unique().tolist()),
+        diff=diff,
+    )
+
+
+class DatasetManager:
+    """Serves the current dataset snapshot and swaps in new versions.
+
+    ``current()`` never waits for a reload: when the source file changes, one
+    background thread re-reads it in full, diffs it against the current
+    version by facility id, patches what build_snapshot can patch and then
+    replaces the snapshot reference. Reruns already holding the old snapshot finish with it.
+    With ``shared_path`` the dataset is attached from the published Arrow
+    file (see shared_dataset.py) instead of being loaded from the CSV.
+    """
+
+    def __init__(self, file_path, shared_path=None, check_interval=DATASET_CHECK_INTERVAL):
+        self.file_path = file_path
+        self.shared_path = shared_path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._source_key = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _stat_key(self):
+        """Identity of the source CSV and, in shared mode, of the published file."""
+        paths = [self.file_path, self.shared_path] if self.shared_path else [self.file_path]
+        key = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                key.append(None)
+            else:
+                key.append((stat.st_ino, stat.st_size, stat.st_mtime_ns))
+        return tuple(key)
+
+    def _load(self):
+        """(source key, version, df); the key is taken first so edits during the load are seen."""
+        key = self._stat_key()
+        if self.shared_path:
+            # Republishes when the CSV changed since the file was published
+            return key, ensure_published(self.file_path, self.shared_path), attach_dataset(self.shared_path)
+        return key, dataset_version(self.file_path), load_cached_data(self.file_path)
+
+    def current(self):
+        """The latest loaded snapshot; starts a background refresh if the source changed."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    key, version, df = self._load()
+                    self._snapshot = build_snapshot(version, df)
+                    # Only once loaded, so a failed load is retried
+                    self._source_key = key
+            return self._snapshot
+
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            if self._stat_key() != self._source_key and self._lock.acquire(blocking=False):
+                threading.Thread(target=self._refresh_locked, name="dataset-refresh", daemon=True).start()
+        return snapshot
+
+    def refresh(self):
+        """Load the source now if it changed; returns the resulting snapshot."""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh_locked(self):
+        try:
+            self._refresh()
+        except Exception as e:
+            logger.error(f"Dataset refresh failed, keeping version {self._snapshot.version}: {str(e)}")
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        current = self._snapshot
+        start = time.perf_counter()
+        key, version, df = self._load()
+        if version == current.version:
+            self._source_key = key
+            return current
+
+        hashes = row_hashes(df)
+        diff = diff_datasets(current, df, hashes)
+        if diff is not None and diff.empty:
+            # Same rows (e.g. the file was only touched); keep every derived structure
+            self._snapshot = replace(current, version=version, diff=diff)
+            self._source_key = key
+            return self._snapshot
+
+        snapshot = build_snapshot(version, df, hashes, previous=current, diff=diff)
+        self._snapshot = snapshot
+        self._source_key = key
+        if diff is None:
+            logger.info(f"Reloaded dataset {version} in full ({time.perf_counter() - start:.2f}s)")
+        else:
+            logger.info(
+                f"Dataset {version}: {diff.added:,} added, {diff.updated:,} updated, "
+                f"{diff.removed:,} removed ({time.perf_counter() - start:.2f}s)"
+            )
+        return snapshot
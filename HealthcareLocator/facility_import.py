@@ -0,0 +1,118 @@
+import io
+import logging
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import insert
+from data_cache import read_raw_chunks
+from models import Facility
+from utils import BOOL_COLUMNS, FACILITY_ID_COLUMN, clean_facility_chunk
+
+logger = logging.getLogger(__name__)
+
+# Rows read, cleaned and written per batch; bounds the importer's memory
+IMPORT_CHUNK_SIZE = 50_000
+
+# Cleaned CSV column -> facilities table column
+FACILITY_COLUMNS = {
+    FACILITY_ID_COLUMN: 'id',
+    'facility_name': 'facility_name',
+    'facility_type_display': 'facility_type_display',
+    'State': 'state',
+    'Local_Government_Area': 'lga',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    **{col: col for col in BOOL_COLUMNS},
+}
+
+
+def iter_facility_chunks(csv_path, chunksize=IMPORT_CHUNK_SIZE):
+    """Cleaned facility rows of a CSV, one chunk at a time, as facilities table columns."""
+    # Parsed like the app's dataset (as text, same columns) so both derive the same ids
+    for raw in read_raw_chunks([csv_path], chunksize):
+        chunk = clean_facility_chunk(raw)
+        chunk = chunk[list(FACILITY_COLUMNS)].rename(columns=FACILITY_COLUMNS)
+        # A row may only be upserted once per statement
+        chunk = chunk.drop_duplicates(subset='id', keep='last')
+        chunk = chunk.astype(object).where(chunk.notna(), None)
+        chunk['updated_at'] = datetime.utcnow()
+        yield chunk
+
+
+def _copy_upsert(conn, chunk):
+    """Stream a chunk into a staging table with COPY, then upsert it (Postgres/psycopg2)."""
+    columns = list(chunk.columns)
+    column_list = ", ".join(columns)
+    updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in columns if col != 'id')
+
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+
+    cursor = conn.connection.driver_connection.cursor()
+    try:
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS facilities_stage "
+            "(LIKE facilities INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+        cursor.copy_expert(f"COPY facilities_stage ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO facilities ({column_list}) SELECT {column_list} FROM facilities_stage "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}"
+        )
+    finally:
+        cursor.close()
+
+
+def _executemany_upsert(conn, chunk):
+    """Upsert a chunk with one batched executemany (any dialect with ON CONFLICT)."""
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    elif conn.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    else:
+        upsert = None
+
+    rows = chunk.to_dict("records")
+    if upsert is None:
+        conn.execute(insert(Facility.__table__), rows)
+        return
+    statement = upsert(Facility.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['id'],
+        set_={col: statement.excluded[col] for col in chunk.columns if col != 'id'}
+    )
+    conn.execute(statement, rows)
+
+
+def import_facilities(csv_path, engine=None, chunksize=IMPORT_CHUNK_SIZE, use_copy=None):
+    """Upsert every cleaned facility of csv_path into the facilities table.
+
+    Each chunk is committed on its own, so memory stays bounded by the chunk
+    size. COPY is used on psycopg2 connections unless use_copy is False.
+    Returns the number of rows written.
+    """
+    if engine is None:
+        from database import get_engine, ensure_schema
+        ensure_schema()
+        engine = get_engine()
+    if use_copy is None:
+        use_copy = engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+    start = time.perf_counter()
+    total = 0
+    for chunk in iter_facility_chunks(csv_path, chunksize):
+        with engine.begin() as conn:
+            if use_copy:
+                _copy_upsert(conn, chunk)
+            else:
+                _executemany_upsert(conn, chunk)
+        total += len(chunk)
+        logger.info(f"Imported {total:,} facilities ({time.perf_counter() - start:.1f}s)")
+    return total
+
+
+if __name__ == "__main__":
+    # python facility_import.py [path/to/Hospitals.csv]
+    logging.basicConfig(level=logging.INFO)
+    import_facilities(sys.argv[1] if len(sys.argv) > 1 else "attached_assets/Hospitals.csv")
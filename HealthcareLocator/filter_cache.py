@@ -0,0 +1,122 @@
+import os
+import threading
+
+import numpy as np
+from cachetools import LRUCache
+import metrics
+
+# Filter results kept per process, shared by every session: at most this many
+# entries and this many MB of row positions, least recently used evicted first
+FILTER_CACHE_SIZE = int(os.getenv("FILTER_CACHE_SIZE", "512"))
+FILTER_CACHE_MB = float(os.getenv("FILTER_CACHE_MB", "64"))
+
+# Bookkeeping bytes charged per entry on top of its positions array
+_ENTRY_OVERHEAD = 256
+
+
+def filter_key(facility_type=None, services=None, state=None, lga=None, search_term=None):
+    """Normalized filter combination: equivalent sidebar states share one key."""
+    return (
+        facility_type if facility_type and facility_type != "All" else None,
+        tuple(sorted(set(services or []))),
+        state or None,
+        lga or None,
+        (search_term or "").strip().lower(),
+    )
+
+
+class FilterResultCache:
+    """LRU cache of filter results (row positions) per dataset version.
+
+    Bounded both by entry count and by the memory of the cached arrays.
+    Results are stored read-only since they are shared between sessions.
+    """
+
+    def __init__(self, max_entries=FILTER_CACHE_SIZE, max_mb=FILTER_CACHE_MB):
+        self.max_entries = max_entries
+        self._entries = LRUCache(
+            maxsize=int(max_mb * 2**20),
+            getsizeof=lambda positions: positions.nbytes + _ENTRY_OVERHEAD
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._entries.currsize
+
+    def get(self, version, key):
+        with self._lock:
+            return self._entries.get((version, key))
+
+    def put(self, version, key, positions):
+        positions = positions.astype(np.int32 if not len(positions) or positions.max() < 2**31 else np.int64)
+        positions.setflags(write=False)
+        with self._lock:
+            try:
+                self._entries[(version, key)] = positions
+            except ValueError:
+                # Larger than the whole cache
+                return positions
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem()
+        return positions
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = FilterResultCache()
+
+
+def _narrowable(key, version, cache):
+    """Cached positions that the key's result is a subset of, or None.
+
+    A search term's matches are substring matches, so they are among those
+    of any shorter prefix of it, and always among the rows matching the
+    other filters.
+    """
+    *structural, term = key
+    for length in range(len(term) - 1, 0, -1):
+        positions = cache.get(version, (*structural, term[:length]))
+        if positions is not None:
+            return positions
+    return cache.get(version, (*structural, ""))
+
+
+def filter_positions(index, version, facility_type=None, services=None, search_term=None, state=None, lga=None,
+                     cache=_cache):
+    """Row positions matching the filters, answered from the result cache when possible.
+
+    ``index`` is the FilterIndex of the dataset identified by ``version``.
+    Repeated combinations are a lookup; a search term typed further narrows
+    the cached result of what was typed before instead of searching again.
+    """
+    key = filter_key(facility_type, services, state, lga, search_term)
+    positions = cache.get(version, key)
+    if positions is not None:
+        metrics.increment("filter_cache_hits_total")
+        return positions
+    metrics.increment("filter_cache_misses_total")
+
+    *structural, term = key
+    if not term:
+        return cache.put(version, key, index.positions(*structural))
+
+    candidates = _narrowable(key, version, cache)
+    if candidates is None:
+        candidates = cache.put(version, (*structural, ""), index.positions(*structural))
+        positions = index.text.search(term, candidates=candidates)
+    else:
+        positions = index.text.refine(term, candidates)
+    return cache.put(version, key, positions)
+
+
+def _filter_cache_gauges():
+    return {'filter_cache_entries': len(_cache), 'filter_cache_bytes': _cache.nbytes}
+
+
+metrics.register_collector(_filter_cache_gauges)
@@ -0,0 +1,71 @@
+import numpy as np
+from utils import SERVICE_COLUMNS, flag_mask
+from search_index import build_search_index
+
+
+def _pack(mask):
+    return np.packbits(np.asarray(mask, dtype=bool))
+
+
+def _value_bitsets(series):
+    """One packed bitset per distinct value of a column."""
+    codes, uniques = series.factorize()
+    return {
+        value: _pack(codes == code)
+        for code, value in enumerate(uniques)
+    }
+
+
+class FilterIndex:
+    """Packed per-value bitsets for the sidebar filters.
+
+    Built once per dataset; a filter combination is answered by ANDing the
+    relevant bitsets and unpacking the result into row positions. ``text``
+    holds the trigram index used for the search box; it is carried over
+    incrementally from ``previous`` when given.
+    """
+
+    def __init__(self, df, previous=None):
+        self.size = len(df)
+        self.all_rows = _pack(np.ones(self.size, dtype=bool))
+        self.services = {
+            label: _pack(flag_mask(df, column))
+            for label, column in SERVICE_COLUMNS.items()
+        }
+        self.facility_types = _value_bitsets(df['facility_type_display'])
+        self.states = _value_bitsets(df['State'])
+        self.lgas = _value_bitsets(df['Local_Government_Area'])
+        self.text = build_search_index(df, previous.text if previous is not None else None)
+
+    def _bitsets(self, facility_type=None, services=None, state=None, lga=None):
+        if facility_type and facility_type != "All":
+            yield self.facility_types.get(facility_type)
+        for service in services or []:
+            if service in self.services:
+                yield self.services[service]
+        if state:
+            yield self.states.get(state)
+        if lga:
+            yield self.lgas.get(lga)
+
+    def bitset(self, facility_type=None, services=None, state=None, lga=None):
+        """Packed bitset of rows matching every given filter."""
+        result = self.all_rows
+        for bits in self._bitsets(facility_type, services, state, lga):
+            if bits is None:
+                return np.zeros_like(self.all_rows)
+            result = result & bits
+        return result
+
+    def positions(self, facility_type=None, services=None, state=None, lga=None):
+        """Row positions matching every given filter, in dataset order."""
+        bits = self.bitset(facility_type, services, state, lga)
+        return np.flatnonzero(np.unpackbits(bits, count=self.size))
+
+
+def build_filter_index(df, previous=None):
+    """Build a FilterIndex over the cleaned facility frame.
+
+    ``previous`` is the index of an earlier version of the dataset to reuse.
+    """
+    return FilterIndex(df, previous)
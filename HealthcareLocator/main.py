@@ -2,14 +2,19 @@ import streamlit as st
 import folium
 from streamlit_folium import st_folium
 import pandas as pd
-from utils import load_and_clean_data, get_facility_stats, filter_facilities, get_location_options
-from database import init_db
+from utils import FACILITY_BACKEND, get_facility_stats, filter_facilities
+from spatial import nearest_facilities
+from dataset_manager import DatasetManager
+from shared_dataset import SHARED_DATASET_PATH
+from stats_cube import cube_facility_stats
+from map_layers import MAP_CENTER, MAP_ZOOM, MAX_MARKERS, add_clustered_facilities, add_facility_markers
+from routing import ROAD_GRAPH_PATH, load_road_graph, rank_by_travel_time
+from proximity import ALTERNATIVE_SERVICES, PROXIMITY_GRAPH_PATH, load_proximity_graph
+from auth import revoke_token
+from metrics import section, start_rerun
 import requests
 from folium import plugins
 
-# Initialize database
-init_db()
-
 # Page config
 st.set_page_config(
     page_title="Nigerian Healthcare Facilities Explorer",
@@ -17,237 +22,421 @@ st.set_page_config(
     layout="wide"
 )
 
-# Custom CSS
-st.markdown("""
-    <style>
-    .main-header {
-        font-family: 'sans serif';
-        font-size: 3em;
-        font-weight: bold;
-        color: #008751;  /* Nigerian green */
-        text-align: center;
-        padding: 1em 0;
-        border-bottom: 2px solid #008751;
-        margin-bottom: 1em;
-    }
-    .sub-header {
-        color: #008751;
-        font-size: 1.5em;
-        font-weight: bold;
-        margin: 1em 0;
-    }
-    .stat-card {
-        background-color: #ffffff;
-        padding: 1em;
-        border-radius: 10px;
-        border: 2px solid #008751;
-        text-align: center;
-    }
-    .stat-card h3 {
-        color: #008751;
-        margin-bottom: 0.5em;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Add login/register button in the sidebar
-if not st.session_state.get("authentication_status"):
-    if st.sidebar.button("Login/Register"):
-        st.switch_page("pages/patient_auth.py")
-else:
-    # Show logout button in sidebar
-    if st.sidebar.button("Logout"):
-        st.session_state["authentication_status"] = None
-        st.session_state["patient_token"] = None
-        st.session_state["patient_email"] = None
-        st.rerun()
-
-    st.sidebar.write(f"Logged in as: {st.session_state.get('patient_email', 'Unknown')}")
-
-# Load and clean data
-@st.cache_data
-def load_data():
-    return load_and_clean_data("attached_assets/Hospitals.csv")
-
+# Times this rerun (and profiles it when PROFILE_RERUNS is set); see metrics.py
+rerun = start_rerun("main")
 try:
-    df = load_data()
-    states, state_to_lgas = get_location_options(df)
-except Exception as e:
-    st.error(f"Error loading data: {e}")
-    st.stop()
-
-# Main header with Nigerian theme
-st.markdown('<h1 class="main-header">🇳🇬 Nigerian Healthcare Facilities Explorer</h1>', unsafe_allow_html=True)
-
-# Introduction text
-st.markdown("""
-    <div style='padding: 1em; background-color: #f0f2f6; border-radius: 10px; margin-bottom: 2em;'>
-        Welcome to the Nigerian Healthcare Facilities Explorer. This platform provides comprehensive information 
-        about healthcare facilities across Nigeria, helping you locate and learn about medical services in your area.
-        Get directions to any facility by clicking on the markers and selecting your preferred mode of transport.
-    </div>
-""", unsafe_allow_html=True)
-
-# Sidebar filters with improved styling
-st.sidebar.markdown('<h2 style="color: #008751;">Search Filters</h2>', unsafe_allow_html=True)
-
-# Location filters
-selected_state = st.sidebar.selectbox("Select State", ["All"] + states)
-selected_lga = None
-if selected_state != "All":
-    lga_options = state_to_lgas.get(selected_state, [])
-    selected_lga = st.sidebar.selectbox(
-        "Select LGA",
-        ["All"] + lga_options
-    )
+    # Custom CSS
+    st.markdown("""
+        <style>
+        .main-header {
+            font-family: 'sans serif';
+            font-size: 3em;
+            font-weight: bold;
+            color: #008751;  /* Nigerian green */
+            text-align: center;
+            padding: 1em 0;
+            border-bottom: 2px solid #008751;
+            margin-bottom: 1em;
+        }
+        .sub-header {
+            color: #008751;
+            font-size: 1.5em;
+            font-weight: bold;
+            margin: 1em 0;
+        }
+        .stat-card {
+            background-color: #ffffff;
+            padding: 1em;
+            border-radius: 10px;
+            border: 2px solid #008751;
+            text-align: center;
+        }
+        .stat-card h3 {
+            color: #008751;
+            margin-bottom: 0.5em;
+        }
+        </style>
+    """, unsafe_allow_html=True)
 
-# Facility type filter
-facility_types = ["All"] + sorted(df['facility_type_display'].unique().tolist())
-selected_type = st.sidebar.selectbox("Facility Type", facility_types)
-
-# Services filter
-available_services = [
-    "Maternal Health",
-    "Emergency Transport",
-    "Family Planning",
-    "Malaria Treatment"
-]
-selected_services = st.sidebar.multiselect("Available Services", available_services)
-
-# Search box
-search_term = st.sidebar.text_input("🔍 Search by name or location")
-
-# Filter data
-state_filter = selected_state if selected_state != "All" else None
-lga_filter = selected_lga if selected_lga and selected_lga != "All" else None
-
-filtered_df = filter_facilities(
-    df,
-    facility_type=selected_type,
-    services=selected_services,
-    search_term=search_term,
-    state=state_filter,
-    lga=lga_filter
-)
+    # Add login/register button in the sidebar
+    if not st.session_state.get("authentication_status"):
+        if st.sidebar.button("Login/Register"):
+            st.switch_page("pages/patient_auth.py")
+    else:
+        # Show logout button in sidebar
+        if st.sidebar.button("Logout"):
+            revoke_token(st.session_state.get("patient_token"))
+            st.session_state["authentication_status"] = None
+            st.session_state["patient_token"] = None
+            st.session_state["patient_email"] = None
+            st.rerun()
 
-# Statistics cards with Nigerian theme
-st.markdown('<h2 class="sub-header">Healthcare Overview</h2>', unsafe_allow_html=True)
-stats = get_facility_stats(df)
+        st.sidebar.write(f"Logged in as: {st.session_state.get('patient_email', 'Unknown')}")
 
-col1, col2, col3 = st.columns(3)
-with col1:
-    st.markdown("""
-        <div class="stat-card">
-            <h3>Total Facilities</h3>
-            <h2>{:,}</h2>
-        </div>
-    """.format(stats['total_facilities']), unsafe_allow_html=True)
-with col2:
-    st.markdown("""
-        <div class="stat-card">
-            <h3>States Covered</h3>
-            <h2>{:,}</h2>
-        </div>
-    """.format(stats['states']), unsafe_allow_html=True)
-with col3:
+    DATA_PATH = "attached_assets/Hospitals.csv"
+
+    # One dataset manager per server process. Each rerun works on the snapshot
+    # it got here, while changes to the CSV (or the published shared dataset)
+    # are diffed in and swapped in by a background thread (see dataset_manager.py)
+    @st.cache_resource
+    def get_dataset_manager():
+        return DatasetManager(DATA_PATH, shared_path=SHARED_DATASET_PATH)
+
+    # With the PostGIS backend the facilities table is queried per request
+    # and no frame is held in memory (see postgis_backend.py)
+    USE_POSTGIS = FACILITY_BACKEND == "postgis"
+    if USE_POSTGIS:
+        import postgis_backend
+
+    # Sidebar options change only when the facilities table is re-imported
+    @st.cache_resource(ttl=600)
+    def load_postgis_locations():
+        return postgis_backend.get_location_hierarchy()
+
+    @st.cache_data(ttl=600)
+    def load_postgis_facility_types():
+        return postgis_backend.get_facility_types()
+
+    # Road graph for offline travel times; without one, nearest means straight-line distance
+    @st.cache_resource
+    def get_road_graph():
+        return load_road_graph(ROAD_GRAPH_PATH) if ROAD_GRAPH_PATH else None
+
+    # Straight-line nearest facilities considered per facility shown when ranking by travel time
+    ROUTE_CANDIDATES_PER_RESULT = 4
+
+    # Alternatives listed for a facility picked on the map
+    ALTERNATIVES_SHOWN = 10
+
+    # Facility proximity graph bound to the rows of one dataset version
+    @st.cache_resource(max_entries=1)
+    def get_proximity_graph(version, _df):
+        return load_proximity_graph(_df, PROXIMITY_GRAPH_PATH)
+
+    try:
+        if USE_POSTGIS:
+            snapshot = df = None
+            locations = load_postgis_locations()
+            type_options = load_postgis_facility_types()
+        else:
+            with section("load_data"):
+                snapshot = get_dataset_manager().current()
+            df = snapshot.df
+            locations = snapshot.locations
+            type_options = snapshot.facility_types
+    except Exception as e:
+        st.error(f"Error loading data: {e}")
+        st.stop()
+
+    # Main header with Nigerian theme
+    st.markdown('<h1 class="main-header">🇳🇬 Nigerian Healthcare Facilities Explorer</h1>', unsafe_allow_html=True)
+
+    # Introduction text
     st.markdown("""
-        <div class="stat-card">
-            <h3>LGAs Covered</h3>
-            <h2>{:,}</h2>
+        <div style='padding: 1em; background-color: #f0f2f6; border-radius: 10px; margin-bottom: 2em;'>
+            Welcome to the Nigerian Healthcare Facilities Explorer. This platform provides comprehensive information 
+            about healthcare facilities across Nigeria, helping you locate and learn about medical services in your area.
+            Get directions to any facility by clicking on the markers and selecting your preferred mode of transport.
         </div>
-    """.format(stats['lgas']), unsafe_allow_html=True)
+    """, unsafe_allow_html=True)
 
-# Map section
-st.markdown('<h2 class="sub-header">Interactive Facilities Map</h2>', unsafe_allow_html=True)
+    # Sidebar filters with improved styling
+    st.sidebar.markdown('<h2 style="color: #008751;">Search Filters</h2>', unsafe_allow_html=True)
 
-# Add transportation mode selection
-transport_mode = st.radio(
-    "Select transportation mode for directions:",
-    ["🚗 Driving", "🚲 Cycling", "🚶 Walking"],
-    horizontal=True
-)
+    # Location filters, labelled with their facility counts
+    selected_state = st.sidebar.selectbox(
+        "Select State",
+        ["All"] + locations.states,
+        format_func=lambda state: f"{state} ({locations.count(None if state == 'All' else state):,})"
+    )
+    selected_lga = None
+    if selected_state != "All":
+        lga_options = locations.lgas(selected_state)
+        selected_lga = st.sidebar.selectbox(
+            "Select LGA",
+            ["All"] + lga_options,
+            format_func=lambda lga: f"{lga} ({locations.count(selected_state, None if lga == 'All' else lga):,})"
+        )
 
-try:
-    # Initialize the map
-    m = folium.Map(
-        location=[9.0820, 8.6753],  # Nigeria's center
-        zoom_start=6,
-        width=800,
-        height=600
+    # Facility type filter
+    facility_types = ["All"] + type_options
+    selected_type = st.sidebar.selectbox("Facility Type", facility_types)
+
+    # Services filter
+    available_services = [
+        "Maternal Health",
+        "Emergency Transport",
+        "Family Planning",
+        "Malaria Treatment"
+    ]
+    selected_services = st.sidebar.multiselect("Available Services", available_services)
+
+    # Search box
+    search_term = st.sidebar.text_input("🔍 Search by name or location")
+
+    # Nearest facilities to the located/clicked position on the map
+    show_nearest = st.sidebar.checkbox("📍 Show facilities nearest to me")
+    nearest_count = st.sidebar.slider("Number of nearby facilities", 1, 50, 10) if show_nearest else 0
+
+    # Alternatives near a facility picked on the map, for services it lacks
+    show_alternatives = (
+        bool(PROXIMITY_GRAPH_PATH) and not USE_POSTGIS and
+        st.sidebar.checkbox("🏥 Show nearby alternatives", help="Click a facility on the map to pick it.")
     )
 
-    # Add location control
-    plugins.LocateControl().add_to(m)
+    # Filter data
+    state_filter = selected_state if selected_state != "All" else None
+    lga_filter = selected_lga if selected_lga and selected_lga != "All" else None
 
-    # Add routing control
-    plugins.Geocoder().add_to(m)
+    map_view = st.session_state.get("facility_map") or {}
 
-    # Add markers with Nigerian colors
-    for idx, row in filtered_df.iterrows():
-        if idx > 1000:
-            break
+    # With PostGIS only the facilities in the current map view are fetched, at
+    # most MAX_ROWS of them, and one extra row tells whether the map is cut
+    # off; in memory every match is kept and the map layer clusters to the view
+    max_rows = postgis_backend.MAX_ROWS if USE_POSTGIS else None
+    filtered_df = filter_facilities(
+        df,
+        facility_type=selected_type,
+        services=selected_services,
+        search_term=search_term,
+        state=state_filter,
+        lga=lga_filter,
+        index=snapshot.filter_index if snapshot else None,
+        version=snapshot.version if snapshot else None,
+        bounds=map_view.get("bounds") if USE_POSTGIS else None,
+        limit=max_rows + 1 if max_rows else None
+    )
+    map_truncated = bool(max_rows) and len(filtered_df) > max_rows
+    if map_truncated:
+        filtered_df = filtered_df.iloc[:max_rows]
 
-        # Define marker color based on facility type with Nigerian theme
-        colors = {
-            'Teaching / Specialist Hospital': '#008751',  # Nigerian green
-            'District / General Hospital': '#0000FF',     # Blue
-            'Primary Health Centre (PHC)': '#008751',     # Nigerian green
-            'Health Post': '#FFA500',                     # Orange
-            'Dispensary': '#800080'                       # Purple
-        }
-        color = colors.get(row['facility_type_display'], 'gray')
-
-        # Enhanced popup content with directions button
-        popup_html = f"""
-        <div style='width: 250px; padding: 10px; font-family: Arial;'>
-            <h4 style='color: #008751; margin-bottom: 10px;'>{row['facility_name']}</h4>
-            <b style='color: #666;'>Type:</b> {row['facility_type_display']}<br>
-            <b style='color: #666;'>State:</b> {row['State']}<br>
-            <b style='color: #666;'>LGA:</b> {row['Local_Government_Area']}<br>
-            <div style='margin-top: 10px;'>
-                <b style='color: #008751;'>Services:</b><br>
-                {'✓' if row['maternal_health_delivery_services'] else '✗'} Maternal Health<br>
-                {'✓' if row['emergency_transport'] else '✗'} Emergency Transport<br>
-                {'✓' if row['family_planning_yn'] else '✗'} Family Planning<br>
-                {'✓' if row['malaria_treatment_artemisinin'] else '✗'} Malaria Treatment
+    # The cube answers the structural filters; free-text matches need the rows.
+    # In PostGIS mode the map rows are limited to the view, so counts come
+    # from the unbounded aggregate query instead
+    if USE_POSTGIS:
+        stats = postgis_backend.get_facility_stats(
+            facility_type=selected_type,
+            services=selected_services,
+            search_term=search_term,
+            state=state_filter,
+            lga=lga_filter
+        )
+    elif search_term:
+        stats = get_facility_stats(filtered_df)
+    else:
+        with section("cube_facility_stats"):
+            stats = cube_facility_stats(
+                snapshot.stats_cube,
+                facility_type=selected_type,
+                services=selected_services,
+                state=state_filter,
+                lga=lga_filter
+            )
+
+    # Offer close spellings, among the facilities the other filters allow, when a search finds nothing
+    if search_term and stats['total_facilities'] == 0:
+        if USE_POSTGIS:
+            names = postgis_backend.suggest_names(
+                search_term,
+                limit=10,
+                facility_type=selected_type,
+                services=selected_services,
+                state=state_filter,
+                lga=lga_filter
+            )
+        else:
+            candidates = snapshot.filter_index.positions(selected_type, selected_services, state_filter, lga_filter)
+            suggestions = snapshot.filter_index.text.search(search_term, candidates=candidates, fuzzy=True)[:10]
+            names = df['facility_name'].iloc[suggestions].astype(str)
+        # The term itself is no alternative spelling
+        names = [name for name in dict.fromkeys(names) if name.lower() != search_term.strip().lower()][:5]
+        if names:
+            st.sidebar.info(f"No exact matches. Did you mean: {', '.join(names)}?")
+
+    # Statistics cards with Nigerian theme
+    st.markdown('<h2 class="sub-header">Healthcare Overview</h2>', unsafe_allow_html=True)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown("""
+            <div class="stat-card">
+                <h3>Total Facilities</h3>
+                <h2>{:,}</h2>
+            </div>
+        """.format(stats['total_facilities']), unsafe_allow_html=True)
+    with col2:
+        st.markdown("""
+            <div class="stat-card">
+                <h3>States Covered</h3>
+                <h2>{:,}</h2>
             </div>
-            <div style='margin-top: 10px; text-align: center;'>
-                <a href='https://www.google.com/maps/dir/?api=1&destination={row['latitude']},{row['longitude']}'
-                   target='_blank' style='
-                   background-color: #008751;
-                   color: white;
-                   padding: 8px 15px;
-                   border-radius: 5px;
-                   text-decoration: none;
-                   display: inline-block;
-                   margin-top: 10px;
-                   '>
-                    Get Directions 🗺️
-                </a>
+        """.format(stats['states']), unsafe_allow_html=True)
+    with col3:
+        st.markdown("""
+            <div class="stat-card">
+                <h3>LGAs Covered</h3>
+                <h2>{:,}</h2>
             </div>
+        """.format(stats['lgas']), unsafe_allow_html=True)
+
+    # Map section
+    st.markdown('<h2 class="sub-header">Interactive Facilities Map</h2>', unsafe_allow_html=True)
+
+    # Add transportation mode selection
+    TRANSPORT_MODES = {"🚗 Driving": "driving", "🚲 Cycling": "cycling", "🚶 Walking": "walking"}
+    transport_mode = st.radio(
+        "Select transportation mode for directions:",
+        list(TRANSPORT_MODES),
+        horizontal=True
+    )
+    travel_mode = TRANSPORT_MODES[transport_mode]
+
+    # Rendering mode for the facility markers
+    map_mode = st.radio(
+        "Map display:",
+        ["Clustered", "Individual markers"],
+        horizontal=True,
+        help="Clustered groups facilities per zoom level and only draws those in view."
+    )
+
+    try:
+        # Initialize the map
+        m = folium.Map(
+            location=MAP_CENTER,
+            zoom_start=MAP_ZOOM,
+            width=800,
+            height=600
+        )
+
+        # Add location control
+        plugins.LocateControl().add_to(m)
+
+        # Add routing control
+        plugins.Geocoder().add_to(m)
+
+        # Markers live in their own layer so panning and filtering only update
+        # this layer instead of re-rendering the whole map
+        facility_layer = folium.FeatureGroup(name="Facilities")
+
+        with section("map_markers"):
+            if map_mode == "Clustered":
+                add_clustered_facilities(
+                    facility_layer,
+                    filtered_df,
+                    zoom=map_view.get("zoom") or MAP_ZOOM,
+                    bounds=map_view.get("bounds"),
+                    travel_mode=travel_mode
+                )
+            else:
+                add_facility_markers(facility_layer, filtered_df, limit=MAX_MARKERS, travel_mode=travel_mode)
+                if len(filtered_df) > MAX_MARKERS:
+                    st.caption(
+                        f"Showing the first {MAX_MARKERS:,} of {len(filtered_df):,} matching facilities. "
+                        "Switch to the clustered view to see all of them."
+                    )
+            if map_truncated:
+                st.caption(
+                    f"The map shows the first {postgis_backend.MAX_ROWS:,} matching facilities in view "
+                    f"({stats['total_facilities']:,} match overall). Zoom in to see the rest."
+                )
+
+        # Display map
+        with section("st_folium"):
+            map_data = st_folium(
+                m,
+                width=800,
+                key="facility_map",
+                feature_group_to_add=facility_layer,
+                returned_objects=["bounds", "zoom", "center", "last_clicked", "last_object_clicked"]
+            )
+
+    except Exception as e:
+        st.error(f"Error rendering map: {e}")
+        map_data = None
+
+    # Nearest facilities to the clicked point, or to the map centre once
+    # the locate control has moved the map to the user's position
+    if show_nearest:
+        st.markdown('<h2 class="sub-header">Nearest Facilities</h2>', unsafe_allow_html=True)
+        origin = None
+        if map_data:
+            origin = map_data.get("last_clicked") or map_data.get("center")
+
+        if origin:
+            road_graph = get_road_graph()
+            candidate_count = nearest_count * ROUTE_CANDIDATES_PER_RESULT if road_graph else nearest_count
+            if USE_POSTGIS:
+                nearest_df = postgis_backend.nearest_facilities(origin["lat"], origin["lng"], k=candidate_count)
+            else:
+                nearest_df = nearest_facilities(
+                    df, snapshot.spatial_index, origin["lat"], origin["lng"], k=candidate_count
+                )
+
+            columns = ['facility_name', 'facility_type_display', 'State', 'Local_Government_Area', 'distance_km']
+            if road_graph:
+                with section("rank_by_travel_time"):
+                    nearest_df = rank_by_travel_time(
+                        road_graph, nearest_df, origin["lat"], origin["lng"], mode=travel_mode, k=nearest_count
+                    )
+                columns.append('travel_min')
+                st.caption(f"Quickest to reach from {origin['lat']:.4f}, {origin['lng']:.4f} ({transport_mode})")
+            else:
+                st.caption(f"Closest to {origin['lat']:.4f}, {origin['lng']:.4f}")
+            st.dataframe(
+                nearest_df[columns],
+                column_config={
+                    "distance_km": st.column_config.NumberColumn("Distance (km)", format="%.2f"),
+                    "travel_min": st.column_config.NumberColumn("Travel time (min)", format="%.0f"),
+                },
+                hide_index=True
+            )
+        else:
+            st.info("Use the locate button on the map or click a point to find the nearest facilities.")
+
+    # Facilities close to the picked one that offer a service it lacks; the
+    # proximity graph answers this from the picked facility's stored neighbours
+    if show_alternatives:
+        st.markdown('<h2 class="sub-header">Nearby Alternatives</h2>', unsafe_allow_html=True)
+        picked = map_data and (map_data.get("last_object_clicked") or map_data.get("last_clicked"))
+        proximity_graph = None
+        if picked:
+            try:
+                proximity_graph = get_proximity_graph(snapshot.version, df)
+            except Exception as e:
+                st.warning(f"Nearby alternatives are unavailable: {e}")
+        if proximity_graph is not None:
+            position = snapshot.spatial_index.nearest(picked["lat"], picked["lng"], k=1)[0][0]
+            facility = df.iloc[position]
+            offered = proximity_graph.offered(position)
+            lacking = [label for label, column in ALTERNATIVE_SERVICES.items() if column not in offered]
+            st.caption(f"{facility['facility_name']} ({facility['facility_type_display']}, {facility['Local_Government_Area']})")
+            if lacking:
+                needed = st.selectbox("Find nearby facilities offering", lacking)
+                with section("nearest_with_service"):
+                    positions, distances = proximity_graph.nearest_with(
+                        position, {ALTERNATIVE_SERVICES[needed]}, n=ALTERNATIVES_SHOWN
+                    )
+                if len(positions):
+                    st.dataframe(
+                        df.iloc[positions][['facility_name', 'facility_type_display', 'State', 'Local_Government_Area']]
+                        .assign(distance_km=distances),
+                        column_config={"distance_km": st.column_config.NumberColumn("Distance (km)", format="%.2f")},
+                        hide_index=True
+                    )
+                else:
+                    st.info(f"None of the {len(proximity_graph.neighbours(position)[0])} closest facilities offer {needed}.")
+            else:
+                st.success("This facility offers every listed service.")
+        elif not picked:
+            st.info("Click a facility on the map to see nearby alternatives.")
+
+    # Footer with Nigerian theme
+    st.markdown("---")
+    st.markdown("""
+        <div style='text-align: center; color: #666; padding: 20px;'>
+            <p>Data source: Nigerian Healthcare Facilities Database</p>
+            <p style='margin: 10px 0;'><strong>Contact Us:</strong> <a href="mailto:admin@nhcservice.com" style='color: #008751;'>admin@nhcservice.com</a></p>
+            <p style='color: #008751;'>🇳🇬 Supporting Healthcare Access Across Nigeria 🇳🇬</p>
         </div>
-        """
-
-        folium.CircleMarker(
-            location=[row['latitude'], row['longitude']],
-            radius=6,
-            popup=folium.Popup(popup_html, max_width=300),
-            color=color,
-            fill=True
-        ).add_to(m)
-
-    # Display map
-    map_data = st_folium(m, width=800)
-
-except Exception as e:
-    st.error(f"Error rendering map: {e}")
-
-# Footer with Nigerian theme
-st.markdown("---")
-st.markdown("""
-    <div style='text-align: center; color: #666; padding: 20px;'>
-        <p>Data source: Nigerian Healthcare Facilities Database</p>
-        <p style='margin: 10px 0;'><strong>Contact Us:</strong> <a href="mailto:admin@nhcservice.com" style='color: #008751;'>admin@nhcservice.com</a></p>
-        <p style='color: #008751;'>🇳🇬 Supporting Healthcare Access Across Nigeria 🇳🇬</p>
-    </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+    """, unsafe_allow_html=True)
+finally:
+    rerun.end()
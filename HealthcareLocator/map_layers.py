@@ -0,0 +1,227 @@
+import folium
+import numpy as np
+from branca.element import MacroElement
+from jinja2 import Template
+from utils import SERVICE_COLUMNS, pack_flags
+
+# Nigeria's center and the initial zoom of the facilities map
+MAP_CENTER = [9.0820, 8.6753]
+MAP_ZOOM = 6
+
+# Upper bound on individually drawn markers
+MAX_MARKERS = 1000
+
+# Grid cell size, in screen pixels, that facilities are clustered into
+CLUSTER_CELL_PX = 60
+TILE_SIZE = 256
+
+# Marker color based on facility type with Nigerian theme
+FACILITY_COLORS = {
+    'Teaching / Specialist Hospital': '#008751',  # Nigerian green
+    'District / General Hospital': '#0000FF',     # Blue
+    'Primary Health Centre (PHC)': '#008751',     # Nigerian green
+    'Health Post': '#FFA500',                     # Orange
+    'Dispensary': '#800080'                       # Purple
+}
+
+
+# Service columns listed in the facility popup, in sidebar order
+POPUP_SERVICES = {column: label for label, column in SERVICE_COLUMNS.items()}
+
+
+def _encode(series):
+    """Dictionary-encode a column as (codes, values) lists for the browser."""
+    codes, uniques = series.astype(str).factorize()
+    return codes.tolist(), list(uniques)
+
+
+def facility_marker_data(df):
+    """Column-wise marker payload: coordinates, colors and popup fields.
+
+    Repeated strings (type, state, LGA) are dictionary-encoded and services
+    packed into one bitmask per facility, so the payload is a handful of flat
+    arrays rather than one HTML blob per marker.
+    """
+    palette = list(dict.fromkeys(FACILITY_COLORS.values())) + ['gray']
+    color_codes = (
+        df['facility_type_display'].astype(str)
+        .map({name: palette.index(color) for name, color in FACILITY_COLORS.items()})
+        .fillna(len(palette) - 1)
+        .astype(int)
+    )
+
+    services = pack_flags(df, POPUP_SERVICES)
+
+    types, type_values = _encode(df['facility_type_display'])
+    states, state_values = _encode(df['State'])
+    lgas, lga_values = _encode(df['Local_Government_Area'])
+    return {
+        # Widened first so float32 coordinates serialize as short decimals
+        'lat': df['latitude'].astype('float64').round(6).tolist(),
+        'lon': df['longitude'].astype('float64').round(6).tolist(),
+        'color': color_codes.tolist(),
+        'name': df['facility_name'].astype(str).tolist(),
+        'type': types,
+        'state': states,
+        'lga': lgas,
+        'services': services.tolist(),
+        'palette': palette,
+        'types': type_values,
+        'states': state_values,
+        'lgas': lga_values,
+        'serviceLabels': list(POPUP_SERVICES.values()),
+    }
+
+
+# Routing modes (see routing.py) as Google Maps directions travel modes
+GOOGLE_TRAVEL_MODES = {
+    'driving': "driving",
+    'cycling': "bicycling",
+    'walking': "walking"
+}
+
+
+class FacilityMarkers(MacroElement):
+    """All facility markers as one canvas-rendered layer with lazily built popups.
+
+    Popup HTML is only generated in the browser when a marker is opened.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var d = {{ this.data|tojson }};
+            var layer = {{ this._parent.get_name() }};
+            var renderer = L.canvas({padding: 0.5});
+
+            function esc(text) {
+                return String(text).replace(/[&<>"']/g, function(c) {
+                    return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+                });
+            }
+
+            function popup(i) {
+                var services = d.serviceLabels.map(function(label, bit) {
+                    return ((d.services[i] >> bit) & 1 ? '✓ ' : '✗ ') + label;
+                }).join('<br>');
+                return "<div style='width: 250px; padding: 10px; font-family: Arial;'>" +
+                    "<h4 style='color: #008751; margin-bottom: 10px;'>" + esc(d.name[i]) + "</h4>" +
+                    "<b style='color: #666;'>Type:</b> " + esc(d.types[d.type[i]]) + "<br>" +
+                    "<b style='color: #666;'>State:</b> " + esc(d.states[d.state[i]]) + "<br>" +
+                    "<b style='color: #666;'>LGA:</b> " + esc(d.lgas[d.lga[i]]) + "<br>" +
+                    "<div style='margin-top: 10px;'><b style='color: #008751;'>Services:</b><br>" +
+                    services + "</div>" +
+                    "<div style='margin-top: 10px; text-align: center;'>" +
+                    "<a href='https://www.google.com/maps/dir/?api=1&travelmode=" + d.travelMode +
+                    "&destination=" + d.lat[i] + "," + d.lon[i] + "'" +
+                    " target='_blank' style='background-color: #008751; color: white; padding: 8px 15px;" +
+                    " border-radius: 5px; text-decoration: none; display: inline-block; margin-top: 10px;'>" +
+                    "Get Directions 🗺️</a></div></div>";
+            }
+
+            for (var i = 0; i < d.lat.length; i++) {
+                L.circleMarker([d.lat[i], d.lon[i]], {
+                    renderer: renderer,
+                    radius: 6,
+                    color: d.palette[d.color[i]],
+                    fill: true
+                }).bindPopup(popup.bind(null, i), {maxWidth: 300}).addTo(layer);
+            }
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, df, travel_mode="driving"):
+        super().__init__()
+        self._name = "FacilityMarkers"
+        self.data = facility_marker_data(df)
+        self.data['travelMode'] = GOOGLE_TRAVEL_MODES.get(travel_mode, "driving")
+
+
+def add_facility_markers(layer, df, limit=MAX_MARKERS, travel_mode="driving"):
+    """Draw the facilities, up to limit rows, as a single marker layer."""
+    FacilityMarkers(df.head(limit), travel_mode).add_to(layer)
+
+
+def _world_pixels(lat, lon, zoom):
+    """Web Mercator pixel coordinates at the given zoom level."""
+    scale = TILE_SIZE * 2.0 ** zoom
+    sin_lat = np.clip(np.sin(np.radians(lat)), -0.9999, 0.9999)
+    x = (np.asarray(lon) + 180.0) / 360.0 * scale
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * np.pi)) * scale
+    return x, y
+
+
+def _viewport(bounds):
+    """(south, west, north, east) from st_folium bounds, or None before the map has reported any."""
+    try:
+        south, west = float(bounds['_southWest']['lat']), float(bounds['_southWest']['lng'])
+        north, east = float(bounds['_northEast']['lat']), float(bounds['_northEast']['lng'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if north <= south or east <= west:
+        return None
+    return south, west, north, east
+
+
+def _in_bounds(df, viewport, padding=0.1):
+    """Boolean mask of facilities inside the (padded) map viewport."""
+    south, west, north, east = viewport
+    pad_lat = (north - south) * padding
+    pad_lon = (east - west) * padding
+    lat = df['latitude'].to_numpy()
+    lon = df['longitude'].to_numpy()
+    return (
+        (lat >= south - pad_lat) & (lat <= north + pad_lat) &
+        (lon >= west - pad_lon) & (lon <= east + pad_lon)
+    )
+
+
+def cluster_facilities(df, zoom, bounds=None, cell_px=CLUSTER_CELL_PX):
+    """Group facilities in view into screen-space grid clusters for a zoom level.
+
+    Returns (clusters, singles): clusters is a dict of latitude, longitude and
+    count arrays for cells holding several facilities, singles the positions
+    in df of facilities alone in their cell. The number of cells in a
+    viewport is fixed by its pixel size, so the output stays bounded.
+    """
+    positions = np.arange(len(df))
+    viewport = _viewport(bounds) if bounds else None
+    if viewport:
+        positions = positions[_in_bounds(df, viewport)]
+
+    lat = df['latitude'].to_numpy()[positions]
+    lon = df['longitude'].to_numpy()[positions]
+    x, y = _world_pixels(lat, lon, zoom)
+    cells = np.floor(x / cell_px).astype(np.int64) * (1 << 32) + np.floor(y / cell_px).astype(np.int64)
+
+    _, inverse, counts = np.unique(cells, return_inverse=True, return_counts=True)
+    grouped = counts > 1
+    clusters = {
+        'latitude': (np.bincount(inverse, weights=lat) / counts)[grouped],
+        'longitude': (np.bincount(inverse, weights=lon) / counts)[grouped],
+        'count': counts[grouped],
+    }
+    singles = positions[~grouped[inverse]]
+    return clusters, singles
+
+
+def add_clustered_facilities(layer, df, zoom, bounds=None, travel_mode="driving"):
+    """Draw cluster bubbles and lone facility markers for the current viewport."""
+    clusters, singles = cluster_facilities(df, zoom, bounds)
+
+    for lat, lon, count in zip(clusters['latitude'], clusters['longitude'], clusters['count']):
+        size = int(24 + 8 * np.log10(count))
+        folium.Marker(
+            location=[lat, lon],
+            icon=folium.DivIcon(
+                icon_size=(size, size),
+                icon_anchor=(size // 2, size // 2),
+                html=f"""<div style='width: {size}px; height: {size}px; line-height: {size}px;
+                    border-radius: 50%; background-color: rgba(0, 135, 81, 0.75); color: white;
+                    text-align: center; font-weight: bold; font-size: 11px;'>{count:,}</div>"""
+            ),
+            tooltip=f"{count:,} facilities - zoom in to see them"
+        ).add_to(layer)
+
+    add_facility_markers(layer, df.iloc[singles], travel_mode=travel_mode)
@@ -0,0 +1,265 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Where metrics are written: Prometheus text format (e.g. for the node
+# exporter's textfile collector), or a JSON summary when the name ends in
+# .json. "{pid}" in the name gives each server process its own file.
+METRICS_FILE = os.getenv("METRICS_FILE")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "15"))
+
+# Opt-in per-rerun profiling: "cprofile" or "pyinstrument"; captures go to PROFILE_DIR
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "").lower()
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+# Reruns slower than this are logged with their slowest sections
+SLOW_RERUN_SECONDS = float(os.getenv("SLOW_RERUN_SECONDS", "2"))
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Recent samples kept per histogram for percentiles
+RECENT_SAMPLES = 1000
+
+
+class Histogram:
+    """Prometheus-style cumulative latency buckets plus recent samples for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)):
+        samples = sorted(self.recent)
+        if not samples:
+            return {q: None for q in quantiles}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles}
+
+
+_histograms = {}  # (name, labels) -> Histogram
+_counters = {}    # (name, labels) -> value
+_collectors = []  # callables returning {name: value} gauges, read at export time
+_lock = threading.Lock()
+_flushed_at = 0.0
+_local = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    """Record one latency sample (seconds) in the histogram name{labels}."""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+    sections = getattr(_local, "sections", None)
+    if sections is not None:
+        sections.append((name, key[1], seconds))
+
+
+def increment(name, value=1, **labels):
+    """Add value to the counter name{labels}."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_collector(collector):
+    """Export the gauges returned by collector() (a {name: number} dict) with every flush."""
+    _collectors.append(collector)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Time the enclosed block into the histogram name{labels}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def section(name):
+    """Time the enclosed block as section_seconds{section=name}."""
+    return timer("section_seconds", section=name)
+
+
+def timed(name):
+    """Decorator timing every call of the function as section_seconds{section=name}."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with section(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Rerun:
+    """Times one script rerun and, when enabled, profiles it."""
+
+    def __init__(self, page):
+        self.page = page
+        self.profiler = _start_profiler()
+        _local.sections = []
+        self.start = time.perf_counter()
+
+    def end(self):
+        seconds = time.perf_counter() - self.start
+        sections, _local.sections = _local.sections, None
+        observe("rerun_seconds", seconds, page=self.page)
+        if self.profiler is not None:
+            _save_profile(self.profiler, self.page)
+        if seconds >= SLOW_RERUN_SECONDS:
+            slowest = sorted(sections, key=lambda section: -section[2])[:5]
+            details = ", ".join(f"{name}{_format_labels(labels)}={s * 1000:.0f}ms" for name, labels, s in slowest)
+            logger.warning(f"Slow rerun of {self.page}: {seconds:.2f}s ({details})")
+        flush()
+        return seconds
+
+
+def start_rerun(page):
+    """Start timing a rerun of page; call .end() on the result as the script's last step."""
+    return Rerun(page)
+
+
+def _start_profiler():
+    if PROFILE_RERUNS == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif PROFILE_RERUNS == "pyinstrument":
+        # Optional dependency, only needed when this mode is selected
+        from pyinstrument import Profiler
+        profiler = Profiler()
+        profiler.start()
+    else:
+        return None
+    return profiler
+
+
+def _save_profile(profiler, page):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stem = os.path.join(PROFILE_DIR, f"{page}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{threading.get_ident()}")
+    if PROFILE_RERUNS == "cprofile":
+        profiler.disable()
+        profiler.dump_stats(f"{stem}.prof")
+    else:
+        profiler.stop()
+        with open(f"{stem}.html", "w") as f:
+            f.write(profiler.output_html())
+
+
+def _format_labels(labels):
+    """Prometheus label set of (name, value) pairs, with values escaped."""
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def render_prometheus():
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: (h.buckets, list(h.counts), h.total, h.count) for key, h in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    typed = set()
+    for (name, labels), value in sorted(counters.items()):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for name, value in sorted(_collected().items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _collected():
+    gauges = {}
+    for collector in _collectors:
+        try:
+            gauges.update({name: value for name, value in collector().items() if value is not None})
+        except Exception as e:
+            logger.warning(f"Metrics collector {collector.__name__} failed: {str(e)}")
+    return gauges
+
+
+def get_metrics_summary():
+    """Counts and p50/p95/p99 latencies per histogram, counters and gauges."""
+    with _lock:
+        histograms = {
+            f"{name}{_format_labels(labels)}": {
+                'count': histogram.count,
+                'sum': histogram.total,
+                **{f"p{int(q * 100)}": value for q, value in histogram.percentiles().items()},
+            }
+            for (name, labels), histogram in _histograms.items()
+        }
+        counters = {f"{name}{_format_labels(labels)}": value for (name, labels), value in _counters.items()}
+    return {'histograms': histograms, 'counters': counters, 'gauges': _collected()}
+
+
+def write_metrics_file(path=METRICS_FILE):
+    """Write the metrics to path atomically."""
+    if path.endswith(".json"):
+        content = json.dumps(get_metrics_summary(), indent=2, sort_keys=True)
+    else:
+        content = render_prometheus()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def flush(force=False):
+    """Write METRICS_FILE if set and the flush interval has passed."""
+    global _flushed_at
+    if not METRICS_FILE:
+        return
+    now = time.monotonic()
+    if not force and now - _flushed_at < METRICS_FLUSH_INTERVAL:
+        return
+    _flushed_at = now
+    path = METRICS_FILE.replace("{pid}", str(os.getpid()))
+    try:
+        write_metrics_file(path)
+    except OSError as e:
+        logger.warning(f"Could not write metrics file {path}: {str(e)}")
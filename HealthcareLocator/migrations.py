@@ -0,0 +1,108 @@
+import logging
+import re
+from contextlib import contextmanager
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Postgres advisory lock key held while migrating, so concurrent starts apply
+# each migration once
+MIGRATION_LOCK_ID = 7_240_113
+
+# Name of the index a CREATE INDEX ... IF NOT EXISTS statement builds
+_INDEX_NAME = re.compile(r"CREATE INDEX .*?IF NOT EXISTS (\w+)", re.IGNORECASE)
+
+# Schema changes for databases created before the current models.
+# create_all only creates missing tables and never alters existing ones, so
+# each change is listed here as (id, statements) in the order it must be
+# applied, and recorded in schema_migrations once it has run.
+MIGRATIONS = [
+    ("0001_patient_history_indexes", [
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_medical_histories_patient_id "
+        "ON medical_histories (patient_id)",
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_health_visits_patient_id_visit_date "
+        "ON health_visits (patient_id, visit_date, id)",
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_allergies_patient_id_diagnosed_date "
+        "ON allergies (patient_id, diagnosed_date, id)",
+    ]),
+    ("0002_health_visits_facility_index", [
+        "CREATE INDEX {concurrently} IF NOT EXISTS ix_health_visits_facility_id "
+        "ON health_visits (facility_id)",
+    ]),
+]
+
+
+def applied_migrations(conn):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "id VARCHAR PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    return {row[0] for row in conn.execute(text("SELECT id FROM schema_migrations"))}
+
+
+@contextmanager
+def migration_lock(conn):
+    """Hold the migration advisory lock (Postgres) for the life of the block."""
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_ID})
+
+
+def drop_invalid_index(conn, statement):
+    """Drop the index a CREATE INDEX statement builds if an interrupted build left it INVALID.
+
+    A failed or killed CREATE INDEX CONCURRENTLY leaves the index behind,
+    unusable, and IF NOT EXISTS would then skip rebuilding it.
+    """
+    match = _INDEX_NAME.search(statement)
+    if conn.dialect.name != "postgresql" or not match:
+        return False
+    invalid = conn.execute(
+        text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": match.group(1)}
+    ).scalar()
+    if not invalid:
+        return False
+    logger.warning(f"Rebuilding invalid index {match.group(1)}")
+    conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}"))
+    return True
+
+
+def run_migrations(engine):
+    """Apply pending migrations; returns the ids that were applied.
+
+    Safe to run from several processes at once: on Postgres they take turns
+    under an advisory lock and skip what another process already applied.
+    """
+    # Postgres builds indexes without blocking writes when run outside a transaction
+    postgres = engine.dialect.name == "postgresql"
+    concurrently = "CONCURRENTLY" if postgres else ""
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn, migration_lock(conn):
+        done = applied_migrations(conn)
+        applied = []
+        for migration_id, statements in MIGRATIONS:
+            if migration_id in done:
+                continue
+            logger.info(f"Applying migration {migration_id}")
+            for statement in statements:
+                drop_invalid_index(conn, statement)
+                conn.execute(text(statement.format(concurrently=concurrently)))
+            conn.execute(
+                text("INSERT INTO schema_migrations (id) VALUES (:id) ON CONFLICT (id) DO NOTHING"),
+                {"id": migration_id}
+            )
+            applied.append(migration_id)
+    return applied
+
+
+if __name__ == "__main__":
+    # Deploy step: python -m migrations; creates missing tables and applies pending migrations
+    logging.basicConfig(level=logging.INFO)
+    from database import init_db
+    init_db()
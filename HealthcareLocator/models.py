@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -27,7 +27,7 @@ class MedicalHistory(Base):
     __tablename__ = "medical_histories"
     
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"))
+    patient_id = Column(Integer, ForeignKey("patients.id"), index=True)
     medical_conditions = Column(Text)
     surgical_history = Column(Text)
     family_history = Column(Text)
@@ -39,9 +39,13 @@ class MedicalHistory(Base):
 
 class Allergy(Base):
     __tablename__ = "allergies"
+    __table_args__ = (
+        # Keyset pagination of a patient's allergies
+        Index("ix_allergies_patient_id_diagnosed_date", "patient_id", "diagnosed_date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"))
+    patient_id = Column(Integer, ForeignKey("patients.id"))  # Indexed by the composite above
     allergen = Column(String)
     reaction = Column(String)
     severity = Column(String)  # mild, moderate, severe
@@ -52,10 +56,14 @@ class Allergy(Base):
 
 class HealthVisit(Base):
     __tablename__ = "health_visits"
+    __table_args__ = (
+        # Keyset pagination of a patient's visit history
+        Index("ix_health_visits_patient_id_visit_date", "patient_id", "visit_date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.id"))
-    facility_id = Column(String)  # References the facility from Hospitals.csv
+    patient_id = Column(Integer, ForeignKey("patients.id"))  # Indexed by the composite above
+    facility_id = Column(String, index=True)  # References Facility.id (from Hospitals.csv)
     visit_date = Column(DateTime)
     reason = Column(Text)
     notes = Column(Text)
@@ -63,3 +71,32 @@ class HealthVisit(Base):
     
     # Relationship
     patient = relationship("Patient", back_populates="visits")
+    # No database-level foreign key: older visits hold free-text facility ids
+    facility = relationship(
+        "Facility",
+        primaryjoin="foreign(HealthVisit.facility_id) == Facility.id",
+        viewonly=True
+    )
+
+class Facility(Base):
+    __tablename__ = "facilities"
+    
+    id = Column(String, primary_key=True)  # facility_id of the cleaned Hospitals.csv row
+    facility_name = Column(String)
+    facility_type_display = Column(String, index=True)
+    state = Column(String, index=True)
+    lga = Column(String, index=True)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    maternal_health_delivery_services = Column(Boolean)
+    emergency_transport = Column(Boolean)
+    skilled_birth_attendant = Column(Boolean)
+    phcn_electricity = Column(Boolean)
+    c_section_yn = Column(Boolean)
+    improved_water_supply = Column(Boolean)
+    improved_sanitation = Column(Boolean)
+    vaccines_fridge_freezer = Column(Boolean)
+    antenatal_care_yn = Column(Boolean)
+    family_planning_yn = Column(Boolean)
+    malaria_treatment_artemisinin = Column(Boolean)
+    updated_at = Column(DateTime, default=datetime.utcnow)
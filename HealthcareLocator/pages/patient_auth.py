@@ -1,7 +1,8 @@
 import streamlit as st
 import datetime
-from database import get_db
+from database import session_scope
 from auth import create_patient, authenticate_patient, create_access_token
+from metrics import start_rerun
 from datetime import timedelta
 
 def patient_auth_page():
@@ -22,15 +23,16 @@ def patient_auth_page():
 
             if submit_login:
                 try:
-                    db = next(get_db())
-                    patient = authenticate_patient(db, email, password)
-                    if patient:
+                    with session_scope() as db:
+                        patient = authenticate_patient(db, email, password)
+                        patient_email = patient.email if patient else None
+                    if patient_email:
                         access_token = create_access_token(
-                            data={"sub": patient.email},
+                            data={"sub": patient_email},
                             expires_delta=timedelta(minutes=30)
                         )
                         st.session_state["patient_token"] = access_token
-                        st.session_state["patient_email"] = patient.email
+                        st.session_state["patient_email"] = patient_email
                         st.session_state["authentication_status"] = True
                         st.success("Login successful! Redirecting to dashboard...")
                         st.rerun()
@@ -69,16 +71,16 @@ def patient_auth_page():
                         # Create date object from the inputs
                         date_of_birth = datetime.date(year, month, day)
 
-                        db = next(get_db())
-                        patient = create_patient(
-                            db=db,
-                            email=new_email,
-                            username=new_username,
-                            password=new_password,
-                            full_name=full_name,
-                            date_of_birth=datetime.datetime.combine(date_of_birth, datetime.time()),
-                            phone_number=phone_number
-                        )
+                        with session_scope() as db:
+                            patient = create_patient(
+                                db=db,
+                                email=new_email,
+                                username=new_username,
+                                password=new_password,
+                                full_name=full_name,
+                                date_of_birth=datetime.datetime.combine(date_of_birth, datetime.time()),
+                                phone_number=phone_number
+                            )
                         st.success("Registration successful! Please login.")
                     except ValueError as e:
                         st.error(f"Invalid date: {str(e)}")
@@ -90,4 +92,8 @@ def patient_auth_page():
         st.switch_page("pages/patient_dashboard.py")
 
 if __name__ == "__main__":
-    patient_auth_page()
\ No newline at end of file
+    rerun = start_rerun("patient_auth")
+    try:
+        patient_auth_page()
+    finally:
+        rerun.end()
\ No newline at end of file
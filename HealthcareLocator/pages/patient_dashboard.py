@@ -1,8 +1,19 @@
 import streamlit as st
 import datetime
-from database import get_db
-from models import MedicalHistory, Allergy, HealthVisit
-from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from database import session_scope
+from auth import verify_access_token
+from metrics import start_rerun, timed
+from models import Patient, MedicalHistory, Allergy, HealthVisit
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, joinedload
+
+# Visits shown per page of the visit history
+VISITS_PER_PAGE = 10
+
+# Allergies shown per page of the allergy list
+ALLERGIES_PER_PAGE = 10
 
 # Custom CSS for Nigerian theme
 st.markdown("""
@@ -34,14 +45,127 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-def get_patient_data(db: Session, email: str):
-    """Fetch all patient-related data"""
-    from models import Patient
-    patient = db.query(Patient).filter(Patient.email == email).first()
+@dataclass(frozen=True)
+class MedicalHistoryView:
+    medical_conditions: str
+    surgical_history: str
+    family_history: str
+    current_medications: str
+
+@dataclass(frozen=True)
+class AllergyView:
+    id: int
+    allergen: str
+    reaction: str
+    severity: str
+    diagnosed_date: Optional[datetime.datetime]
+
+@dataclass(frozen=True)
+class VisitView:
+    id: int
+    facility_id: str
+    visit_date: datetime.datetime
+    reason: str
+    notes: str
+    follow_up_needed: bool
+
+@dataclass(frozen=True)
+class DashboardData:
+    """Read-only snapshot of everything the dashboard renders."""
+    patient_id: int
+    full_name: str
+    medical_history: Optional[MedicalHistoryView]
+    allergies: Tuple[AllergyView, ...]
+    more_allergies: bool
+    visits: Tuple[VisitView, ...]
+    more_visits: bool
+
+@timed("get_visit_history_page")
+def get_visit_history_page(db: Session, patient_id: int, before: Optional[Tuple[datetime.datetime, int]] = None,
+                           limit: int = VISITS_PER_PAGE):
+    """Visits newest first, starting after the (visit_date, id) cursor of the previous page.
+
+    Served from the (patient_id, visit_date, id) index, so every page costs
+    the same however deep into the history it is.
+    """
+    query = db.query(HealthVisit).filter(HealthVisit.patient_id == patient_id)
+    if before is not None:
+        query = query.filter(tuple_(HealthVisit.visit_date, HealthVisit.id) < tuple_(*before))
+    return (
+        query.order_by(HealthVisit.visit_date.desc(), HealthVisit.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+@timed("get_allergy_page")
+def get_allergy_page(db: Session, patient_id: int, before: Optional[Tuple[datetime.datetime, int]] = None,
+                     limit: int = ALLERGIES_PER_PAGE):
+    """Allergies newest first, starting after the (diagnosed_date, id) cursor of the previous page"""
+    query = db.query(Allergy).filter(Allergy.patient_id == patient_id)
+    if before is not None:
+        query = query.filter(tuple_(Allergy.diagnosed_date, Allergy.id) < tuple_(*before))
+    return (
+        query.order_by(Allergy.diagnosed_date.desc(), Allergy.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+@timed("load_dashboard_data")
+def load_dashboard_data(db: Session, email: str, visits_before: Optional[Tuple[datetime.datetime, int]] = None,
+                        allergies_before: Optional[Tuple[datetime.datetime, int]] = None,
+                        page_size: int = VISITS_PER_PAGE, allergy_page_size: int = ALLERGIES_PER_PAGE):
+    """Load the patient, history and one page each of allergies and visits in a fixed number of queries"""
+    patient = (
+        db.query(Patient)
+        .options(joinedload(Patient.medical_history))
+        .filter(Patient.email == email)
+        .first()
+    )
     if not patient:
         return None
-    return patient
 
+    # One extra row tells whether an older page exists
+    visits = get_visit_history_page(db, patient.id, visits_before, page_size + 1)
+    allergies = get_allergy_page(db, patient.id, allergies_before, allergy_page_size + 1)
+
+    history = patient.medical_history
+    return DashboardData(
+        patient_id=patient.id,
+        full_name=patient.full_name,
+        medical_history=MedicalHistoryView(
+            medical_conditions=history.medical_conditions,
+            surgical_history=history.surgical_history,
+            family_history=history.family_history,
+            current_medications=history.current_medications
+        ) if history else None,
+        allergies=tuple(
+            AllergyView(a.id, a.allergen, a.reaction, a.severity, a.diagnosed_date)
+            for a in allergies[:allergy_page_size]
+        ),
+        more_allergies=len(allergies) > allergy_page_size,
+        visits=tuple(
+            VisitView(v.id, v.facility_id, v.visit_date, v.reason, v.notes, v.follow_up_needed)
+            for v in visits[:page_size]
+        ),
+        more_visits=len(visits) > page_size
+    )
+
+def get_dashboard_data(email: str, visits_before: Optional[Tuple[datetime.datetime, int]] = None,
+                       allergies_before: Optional[Tuple[datetime.datetime, int]] = None):
+    """Dashboard snapshot cached in the Streamlit session until the patient edits something"""
+    key = (email, visits_before, allergies_before)
+    cached = st.session_state.get("dashboard_data")
+    if cached and cached[0] == key:
+        return cached[1]
+    with session_scope() as db:
+        data = load_dashboard_data(db, email, visits_before, allergies_before)
+    st.session_state["dashboard_data"] = (key, data)
+    return data
+
+def invalidate_dashboard_data():
+    st.session_state.pop("dashboard_data", None)
+
+@timed("update_medical_history")
 def update_medical_history(db: Session, patient_id: int, medical_conditions: str, 
                          surgical_history: str, family_history: str, current_medications: str):
     """Update patient's medical history"""
@@ -65,6 +189,7 @@ def update_medical_history(db: Session, patient_id: int, medical_conditions: str
     db.commit()
     return history
 
+@timed("add_allergy")
 def add_allergy(db: Session, patient_id: int, allergen: str, reaction: str, severity: str):
     """Add a new allergy record"""
     allergy = Allergy(
@@ -78,6 +203,7 @@ def add_allergy(db: Session, patient_id: int, allergen: str, reaction: str, seve
     db.commit()
     return allergy
 
+@timed("add_visit")
 def add_visit(db: Session, patient_id: int, facility_id: str, reason: str, notes: str, follow_up_needed: bool):
     """Add a new health visit record"""
     visit = HealthVisit(
@@ -95,23 +221,29 @@ def add_visit(db: Session, patient_id: int, facility_id: str, reason: str, notes
 def patient_dashboard():
     st.title("Patient Dashboard")
 
-    # Check authentication
-    if not st.session_state.get("authentication_status"):
+    # Check authentication; a verified token is served from memory on reruns
+    identity = None
+    if st.session_state.get("authentication_status"):
+        identity = verify_access_token(st.session_state.get("patient_token"))
+    if identity is None:
+        st.session_state["authentication_status"] = None
         st.warning("Please log in to access your dashboard")
         st.switch_page("pages/patient_auth.py")
         return
 
     try:
-        db = next(get_db())
-        patient = get_patient_data(db, st.session_state["patient_email"])
-        
+        # Cursors of the visit and allergy pages opened so far; the last ones are shown
+        visit_cursors = st.session_state.setdefault("visit_cursors", [None])
+        allergy_cursors = st.session_state.setdefault("allergy_cursors", [None])
+        patient = get_dashboard_data(identity.email, visit_cursors[-1], allergy_cursors[-1])
+
         if not patient:
             st.error("Patient data not found")
             return
 
         # Display patient info
         st.header(f"Welcome, {patient.full_name}")
-        
+
         # Create tabs for different sections
         medical_tab, allergies_tab, visits_tab = st.tabs([
             "Medical History", "Allergies", "Health Visits"
@@ -119,7 +251,7 @@ def patient_dashboard():
 
         with medical_tab:
             st.subheader("Medical History")
-            
+
             # Get existing medical history
             history = patient.medical_history
 
@@ -145,35 +277,53 @@ def patient_dashboard():
                     value=history.current_medications if history else "",
                     height=100
                 )
-                
+
                 if st.form_submit_button("Update Medical History"):
-                    updated_history = update_medical_history(
-                        db, patient.id, medical_conditions, surgical_history,
-                        family_history, current_medications
-                    )
+                    with session_scope() as db:
+                        update_medical_history(
+                            db, patient.patient_id, medical_conditions, surgical_history,
+                            family_history, current_medications
+                        )
+                    invalidate_dashboard_data()
                     st.success("Medical history updated successfully!")
 
         with allergies_tab:
             st.subheader("Allergies")
-            
-            # Display existing allergies
+
+            # Display existing allergies, newest first, one page at a time
             if patient.allergies:
                 st.write("Current Allergies:")
                 for allergy in patient.allergies:
                     with st.expander(f"{allergy.allergen} - {allergy.severity}"):
                         st.write(f"Reaction: {allergy.reaction}")
                         st.write(f"Diagnosed: {allergy.diagnosed_date.strftime('%Y-%m-%d')}")
-            
+
+                newer_col, page_col, older_col = st.columns([1, 2, 1])
+                with newer_col:
+                    if st.button("← Newer", key="newer_allergies", disabled=len(allergy_cursors) == 1):
+                        allergy_cursors.pop()
+                        st.rerun()
+                with page_col:
+                    st.caption(f"Page {len(allergy_cursors)}")
+                with older_col:
+                    if st.button("Older →", key="older_allergies", disabled=not patient.more_allergies):
+                        last = patient.allergies[-1]
+                        allergy_cursors.append((last.diagnosed_date, last.id))
+                        st.rerun()
+
             # Form to add new allergy
             with st.form("add_allergy_form"):
                 st.write("Add New Allergy")
                 allergen = st.text_input("Allergen")
                 reaction = st.text_area("Reaction")
                 severity = st.selectbox("Severity", ["Mild", "Moderate", "Severe"])
-                
+
                 if st.form_submit_button("Add Allergy"):
                     if allergen and reaction:
-                        new_allergy = add_allergy(db, patient.id, allergen, reaction, severity)
+                        with session_scope() as db:
+                            add_allergy(db, patient.patient_id, allergen, reaction, severity)
+                        invalidate_dashboard_data()
+                        st.session_state["allergy_cursors"] = [None]
                         st.success("Allergy added successfully!")
                         st.rerun()
                     else:
@@ -181,16 +331,29 @@ def patient_dashboard():
 
         with visits_tab:
             st.subheader("Health Visits")
-            
-            # Display existing visits
+
+            # Display existing visits, newest first, one page at a time
             if patient.visits:
                 st.write("Visit History:")
-                for visit in sorted(patient.visits, key=lambda x: x.visit_date, reverse=True):
+                for visit in patient.visits:
                     with st.expander(f"Visit on {visit.visit_date.strftime('%Y-%m-%d')}"):
                         st.write(f"Reason: {visit.reason}")
                         st.write(f"Notes: {visit.notes}")
                         st.write(f"Follow-up needed: {'Yes' if visit.follow_up_needed else 'No'}")
-            
+
+                newer_col, page_col, older_col = st.columns([1, 2, 1])
+                with newer_col:
+                    if st.button("← Newer", disabled=len(visit_cursors) == 1):
+                        visit_cursors.pop()
+                        st.rerun()
+                with page_col:
+                    st.caption(f"Page {len(visit_cursors)}")
+                with older_col:
+                    if st.button("Older →", disabled=not patient.more_visits):
+                        last = patient.visits[-1]
+                        visit_cursors.append((last.visit_date, last.id))
+                        st.rerun()
+
             # Form to add new visit
             with st.form("add_visit_form"):
                 st.write("Add New Visit")
@@ -198,12 +361,15 @@ def patient_dashboard():
                 reason = st.text_area("Reason for Visit")
                 notes = st.text_area("Visit Notes")
                 follow_up = st.checkbox("Follow-up Needed")
-                
+
                 if st.form_submit_button("Add Visit"):
                     if facility_id and reason and notes:
-                        new_visit = add_visit(
-                            db, patient.id, facility_id, reason, notes, follow_up
-                        )
+                        with session_scope() as db:
+                            add_visit(
+                                db, patient.patient_id, facility_id, reason, notes, follow_up
+                            )
+                        invalidate_dashboard_data()
+                        st.session_state["visit_cursors"] = [None]
                         st.success("Visit record added successfully!")
                         st.rerun()
                     else:
@@ -213,4 +379,8 @@ def patient_dashboard():
         st.error(f"An error occurred: {str(e)}")
 
 if __name__ == "__main__":
-    patient_dashboard()
\ No newline at end of file
+    rerun = start_rerun("patient_dashboard")
+    try:
+        patient_dashboard()
+    finally:
+        rerun.end()
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+from passlib.context import CryptContext
+import metrics
+from pools import process_pool
+
+# bcrypt cost factor for new hashes; older hashes are upgraded on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Hashing worker processes (0 hashes inline) and how many requests may wait for them
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", str(max(HASH_WORKERS, 1) * 4)))
+HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "5"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(max(HASH_QUEUE_SIZE, 1))
+
+
+class HashingBusyError(RuntimeError):
+    """Raised when the hashing queue stays full for longer than the queue timeout."""
+
+
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password, hashed_password):
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = process_pool(HASH_WORKERS)
+    return _executor
+
+
+def _run(operation, func, *args):
+    """Run func in the worker pool, waiting for a queue slot at most HASH_QUEUE_TIMEOUT.
+
+    The latency recorded in password_hash_seconds{operation} includes the
+    time spent queued.
+    """
+    start = time.perf_counter()
+    if not _slots.acquire(timeout=HASH_QUEUE_TIMEOUT):
+        metrics.increment("password_hash_rejected_total")
+        raise HashingBusyError("Too many password operations in progress, please try again")
+    try:
+        if HASH_WORKERS <= 0:
+            result = func(*args)
+        else:
+            result = _get_executor().submit(func, *args).result()
+    finally:
+        _slots.release()
+
+    metrics.observe("password_hash_seconds", time.perf_counter() - start, operation=operation)
+    return result
+
+
+def hash_password(password: str) -> str:
+    """bcrypt hash of password, computed in the worker pool."""
+    return _run('hash', _hash, password)
+
+
+def verify_and_update(password: str, hashed_password: str):
+    """Check password against hashed_password in the worker pool.
+
+    Returns (valid, new_hash); new_hash is set when the stored hash uses
+    outdated parameters (e.g. fewer rounds) and should replace it.
+    """
+    valid, new_hash = _run('verify', _verify_and_update, password, hashed_password)
+    if new_hash:
+        metrics.increment("password_rehashed_total")
+    return valid, new_hash
+
+
+def _hashing_gauges():
+    return {
+        'password_hash_workers': HASH_WORKERS,
+        'password_hash_queue_size': HASH_QUEUE_SIZE,
+        'password_hash_rounds': BCRYPT_ROUNDS,
+    }
+
+
+metrics.register_collector(_hashing_gauges)
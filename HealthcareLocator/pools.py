@@ -0,0 +1,11 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def process_pool(workers, **kwargs):
+    """ProcessPoolExecutor for CPU-bound work (CSV cleaning, hashing, graph builds).
+
+    Workers are spawned rather than forked: forking the threaded Streamlit
+    server process is not safe.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"), **kwargs)
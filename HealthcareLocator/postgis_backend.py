@@ -0,0 +1,211 @@
+import logging
+import sys
+import pandas as pd
+from sqlalchemy import and_, cast, func, literal_column, select, text, true
+from sqlalchemy.types import UserDefinedType
+from models import Facility
+from utils import SERVICE_COLUMNS, LocationHierarchy
+from facility_import import FACILITY_COLUMNS
+from migrations import drop_invalid_index
+
+logger = logging.getLogger(__name__)
+
+# Most rows a map query returns; the map clusters whatever comes back
+MAX_ROWS = 20_000
+
+# PostGIS/pg_trgm schema for the facilities table (run once: python postgis_backend.py init)
+POSTGIS_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS postgis",
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "ALTER TABLE facilities ADD COLUMN IF NOT EXISTS geog geography(Point, 4326) "
+    "GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_facilities_geog ON facilities USING gist (geog)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_facilities_name_trgm "
+    "ON facilities USING gin (lower(facility_name) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_facilities_state_trgm "
+    "ON facilities USING gin (lower(state) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_facilities_lga_trgm "
+    "ON facilities USING gin (lower(lga) gin_trgm_ops)",
+]
+
+
+
+class Geography(UserDefinedType):
+    """PostGIS geography; distances and radii are in metres."""
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "geography"
+
+
+facilities = Facility.__table__
+# Generated column added by init_postgis_schema, not mapped on the model
+geog = literal_column("facilities.geog", Geography())
+
+# Query results use the column names of the cleaned CSV frame
+_RESULT_COLUMNS = [facilities.c[column].label(name) for name, column in FACILITY_COLUMNS.items()]
+
+
+def init_postgis_schema(engine=None):
+    """Add the geography column and the GiST/trigram indexes to the facilities table."""
+    engine = engine or _engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in POSTGIS_SCHEMA:
+            drop_invalid_index(conn, statement)
+            conn.execute(text(statement))
+    logger.info("PostGIS facility schema ready")
+
+
+def _engine():
+    from database import get_engine, ensure_schema
+    ensure_schema()
+    return get_engine()
+
+
+def _point(lat, lon):
+    return cast(func.ST_SetSRID(func.ST_MakePoint(float(lon), float(lat)), 4326), Geography())
+
+
+def _like_pattern(term):
+    escaped = term.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _conditions(facility_type=None, services=None, search_term=None, state=None, lga=None,
+                bounds=None):
+    conditions = []
+    if facility_type and facility_type != "All":
+        conditions.append(facilities.c.facility_type_display == facility_type)
+    for service in services or []:
+        if service in SERVICE_COLUMNS:
+            conditions.append(facilities.c[SERVICE_COLUMNS[service]].is_(True))
+    if state:
+        conditions.append(facilities.c.state == state)
+    if lga:
+        conditions.append(facilities.c.lga == lga)
+    if search_term and search_term.strip():
+        # Served by the lower(...) gin_trgm_ops indexes
+        pattern = _like_pattern(search_term.strip())
+        conditions.append(
+            func.lower(facilities.c.facility_name).like(pattern, escape="\\") |
+            func.lower(facilities.c.state).like(pattern, escape="\\") |
+            func.lower(facilities.c.lga).like(pattern, escape="\\")
+        )
+    if bounds:
+        south, west = bounds['_southWest']['lat'], bounds['_southWest']['lng']
+        north, east = bounds['_northEast']['lat'], bounds['_northEast']['lng']
+        envelope = cast(func.ST_MakeEnvelope(*map(float, (west, south, east, north)), 4326), Geography())
+        conditions.append(geog.op("&&")(envelope))
+    return and_(true(), *conditions)
+
+
+def filter_facilities(df=None, facility_type=None, services=None, search_term=None, state=None, lga=None,
+                      index=None, version=None, bounds=None, limit=None):
+    """utils.filter_facilities pushed down to Postgres, with the same signature.
+
+    ``df``, ``index`` and ``version`` describe the in-memory dataset and are
+    ignored. ``bounds`` (st_folium format) restricts to the map viewport
+    (served by the GiST index); pass a ``limit`` for map queries, since
+    nothing else bounds the rows returned.
+    """
+    query = select(*_RESULT_COLUMNS).where(_conditions(
+        facility_type, services, search_term, state, lga, bounds
+    ))
+    if limit:
+        query = query.limit(limit)
+    with _engine().connect() as conn:
+        return pd.read_sql(query, conn)
+
+
+def nearest_facilities(lat, lon, k=10, radius_km=None):
+    """Facilities closest to a point with a ``distance_km`` column, nearest first.
+
+    k nearest by KNN GiST search; with ``radius_km`` every facility inside
+    the radius instead, like spatial.nearest_facilities.
+    """
+    distance = func.ST_Distance(geog, _point(lat, lon)) / 1000.0
+    query = select(*_RESULT_COLUMNS, distance.label("distance_km"))
+    if radius_km is not None:
+        query = query.where(func.ST_DWithin(geog, _point(lat, lon), radius_km * 1000.0)).order_by(distance)
+    else:
+        query = query.order_by(geog.op("<->")(_point(lat, lon))).limit(k)
+    with _engine().connect() as conn:
+        return pd.read_sql(query, conn)
+
+
+def get_facility_stats(facility_type=None, services=None, search_term=None, state=None, lga=None):
+    """utils.get_facility_stats for a filter combination, aggregated in Postgres."""
+    where = _conditions(facility_type, services, search_term, state, lga)
+    totals = select(
+        func.count().label("total_facilities"),
+        func.count(facilities.c.lga.distinct()).label("lgas"),
+        func.count().filter(facilities.c.phcn_electricity.is_(True)).label("with_electricity"),
+        func.count().filter(facilities.c.improved_water_supply.is_(True)).label("with_water"),
+        func.count().filter(facilities.c.emergency_transport.is_(True)).label("with_emergency"),
+    ).where(where)
+    by_type = (
+        select(facilities.c.facility_type_display, func.count())
+        .where(where)
+        .group_by(facilities.c.facility_type_display)
+        .order_by(func.count().desc())
+    )
+    with _engine().connect() as conn:
+        stats = dict(conn.execute(totals).mappings().one())
+        stats['facility_types'] = dict(conn.execute(by_type).all())
+    stats['states'] = 36  # Fixed number of states in Nigeria
+    return stats
+
+
+def get_location_hierarchy():
+    """State -> LGA hierarchy with facility counts, grouped in Postgres."""
+    query = (
+        select(facilities.c.state, facilities.c.lga, func.count())
+        .where(facilities.c.state.isnot(None), facilities.c.lga.isnot(None))
+        .group_by(facilities.c.state, facilities.c.lga)
+    )
+    with _engine().connect() as conn:
+        rows = conn.execute(query).all()
+    counts = pd.Series(
+        [n for _, _, n in rows],
+        index=pd.MultiIndex.from_tuples([(s, l) for s, l, _ in rows], names=['State', 'Local_Government_Area']),
+        dtype="int64"
+    )
+    return LocationHierarchy(counts)
+
+
+def get_facility_types():
+    """Distinct facility types, sorted."""
+    query = (
+        select(facilities.c.facility_type_display)
+        .where(facilities.c.facility_type_display.isnot(None))
+        .distinct()
+        .order_by(facilities.c.facility_type_display)
+    )
+    with _engine().connect() as conn:
+        return list(conn.execute(query).scalars())
+
+
+def suggest_names(search_term, limit=5, facility_type=None, services=None, state=None, lga=None):
+    """Facility names most similar to a misspelt search term (pg_trgm similarity).
+
+    Only facilities matching the other filters are suggested.
+    """
+    term = search_term.strip().lower()
+    name = func.lower(facilities.c.facility_name)
+    query = (
+        select(facilities.c.facility_name)
+        .where(name.op("%")(term), _conditions(facility_type, services, None, state, lga))
+        .order_by(func.similarity(name, term).desc())
+        .limit(limit)
+    )
+    with _engine().connect() as conn:
+        return list(conn.execute(query).scalars())
+
+
+if __name__ == "__main__":
+    # python postgis_backend.py init
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["init"]:
+        init_postgis_schema()
+    else:
+        sys.exit("Usage: python postgis_backend.py init")
@@ -0,0 +1,273 @@
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from pools import process_pool
+from spatial import KM_PER_DEGREE_LAT, SpatialIndex, haversine_km
+from utils import FACILITY_ID_COLUMN, concat_ranges, pack_flags, required_bits
+
+logger = logging.getLogger(__name__)
+
+# Facility proximity graph built by "python proximity.py build"; nearby alternatives are off when unset
+PROXIMITY_GRAPH_PATH = os.getenv("PROXIMITY_GRAPH_PATH")
+
+# Processes computing neighbours while building the graph
+PROXIMITY_BUILD_WORKERS = int(os.getenv("PROXIMITY_BUILD_WORKERS", str(os.cpu_count() or 1)))
+
+# Neighbours stored per facility; lookups only ever see these
+PROXIMITY_K = 32
+
+# Distance matrix entries computed at once while building
+_BATCH_ENTRIES = 4_000_000
+
+# Services an alternative can be looked up by, and their columns
+ALTERNATIVE_SERVICES = {
+    "Emergency Transport": 'emergency_transport',
+    "C-Section": 'c_section_yn',
+    "Skilled Birth Attendant": 'skilled_birth_attendant',
+    "Maternal Health": 'maternal_health_delivery_services',
+    "Antenatal Care": 'antenatal_care_yn',
+    "Family Planning": 'family_planning_yn',
+    "Malaria Treatment": 'malaria_treatment_artemisinin',
+    "Vaccine Storage": 'vaccines_fridge_freezer',
+    "Electricity": 'phcn_electricity',
+    "Improved Water Supply": 'improved_water_supply',
+    "Improved Sanitation": 'improved_sanitation',
+}
+
+
+def service_bits(df):
+    """ALTERNATIVE_SERVICES packed per facility (bit i is the i-th service)."""
+    return pack_flags(df, ALTERNATIVE_SERVICES.values(), dtype=np.int32)
+
+
+class ProximityGraph:
+    """The nearest facilities of every facility, in CSR form.
+
+    Neighbours of row ``i`` are ``indices[indptr[i]:indptr[i + 1]]``, nearest
+    first, ``distances`` holding their great-circle distance in km. Rows and
+    neighbours are positions in the frame the graph is bound to, whose
+    services are packed into ``services``; a lookup therefore touches only
+    the neighbours of one facility, never the whole dataset.
+    """
+
+    def __init__(self, indptr, indices, distances, services):
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.distances = np.asarray(distances, dtype=np.float32)
+        self.services = np.asarray(services, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def neighbours(self, position):
+        """(positions, distances_km) of the stored neighbours of a facility, nearest first."""
+        lo, hi = self.indptr[position], self.indptr[position + 1]
+        return self.indices[lo:hi], self.distances[lo:hi]
+
+    def offered(self, position):
+        """Columns of ALTERNATIVE_SERVICES that a facility offers."""
+        bits = int(self.services[position])
+        return {column for bit, column in enumerate(ALTERNATIVE_SERVICES.values()) if bits >> bit & 1}
+
+    def nearest_with(self, position, services, n=5):
+        """(positions, distances_km) of the n nearest neighbours offering every given service.
+
+        Fewer are returned when not enough of the stored neighbours qualify.
+        """
+        required = required_bits(ALTERNATIVE_SERVICES.values(), services)
+        positions, distances = self.neighbours(position)
+        hits = np.flatnonzero((self.services[positions] & required) == required)[:n]
+        return positions[hits], distances[hits]
+
+
+def _first_positions(ids, lookup):
+    """Position in ids of the first occurrence of every id in lookup, -1 where absent."""
+    first = np.flatnonzero(~ids.duplicated())
+    found = ids[first].get_indexer(lookup)
+    return np.where(found >= 0, first[found] if len(first) else -1, -1)
+
+
+def bind_proximity_graph(facility_ids, indptr, indices, distances, df):
+    """A ProximityGraph over the rows of df from one built for the facilities in facility_ids.
+
+    Facilities are matched by id, so a graph stays usable as the dataset
+    changes: removed facilities drop out of the neighbour lists and new ones
+    have none until the graph is rebuilt. Rows sharing an id (identical CSV
+    rows hash to the same fallback id) are bound as one facility: they share
+    the neighbours of its first occurrence and are not each other's
+    neighbours.
+    """
+    graph_rows = pd.Index(facility_ids)
+    df_rows = pd.Index(df[FACILITY_ID_COLUMN])
+    to_df = _first_positions(df_rows, graph_rows)
+
+    # Graph CSR with neighbours missing from df (or copies of the row itself) removed
+    row_of_edge = np.repeat(np.arange(len(graph_rows)), np.diff(indptr))
+    targets = to_df[indices]
+    valid = (targets >= 0) & (targets != to_df[row_of_edge])
+    counts = np.bincount(row_of_edge[valid], minlength=len(graph_rows))
+    starts = np.concatenate([[0], np.cumsum(counts)])[:-1]
+    targets, distances = targets[valid], np.asarray(distances)[valid]
+
+    # Reordered into df rows
+    rows = _first_positions(graph_rows, df_rows)
+    lengths = np.where(rows >= 0, counts[rows], 0)
+    edges = concat_ranges(np.where(rows >= 0, starts[rows], 0), lengths)
+    return ProximityGraph(
+        np.concatenate([[0], np.cumsum(lengths)]),
+        targets[edges],
+        distances[edges],
+        service_bits(df),
+    )
+
+
+def load_proximity_graph(df, path=PROXIMITY_GRAPH_PATH):
+    """Load a graph written by build_proximity_graph and bind it to df."""
+    with np.load(path) as data:
+        graph = bind_proximity_graph(
+            data['facility_ids'], data['indptr'], data['indices'], data['distances'], df
+        )
+    missing = int((np.diff(graph.indptr) == 0).sum())
+    logger.info(f"Loaded proximity graph for {len(graph):,} facilities ({missing:,} without neighbours)")
+    return graph
+
+
+_index = None  # Spatial index of the facilities, per build worker
+
+
+def _init_worker(latitudes, longitudes, cell_size_deg):
+    global _index
+    _index = SpatialIndex(latitudes, longitudes, cell_size_deg)
+
+
+def _cell_neighbours(cell_slices, k):
+    """(positions, counts, neighbours, distances) for the facilities in the given grid cells.
+
+    ``cell_slices`` are (start, end) ranges of the index's sorted arrays, one
+    per occupied cell. Each facility is compared with those in the 3x3 block
+    of cells around its own; when its k-th neighbour there is closer than the
+    edge of the block the result is exact, otherwise the facility falls back
+    to a growing-radius query. Neighbour lists are flattened, ``counts``
+    giving their lengths.
+    """
+    index = _index
+    keys, lat, lon, order = index.sorted_keys, index.sorted_lat, index.sorted_lon, index.order
+    positions, counts, neighbours, distances = [], [], [], []
+
+    for start, end in cell_slices:
+        row, col = divmod(int(keys[start]), index.n_cols)
+        block = np.concatenate([
+            np.arange(
+                np.searchsorted(keys, r * index.n_cols + col - 1, side="left"),
+                np.searchsorted(keys, r * index.n_cols + col + 1, side="right"),
+            )
+            for r in (row - 1, row, row + 1)
+        ])
+        # Anything outside the block is at least one cell away
+        edge_lat = min(max(abs((row - 1) * index.cell_size - 90.0), abs((row + 2) * index.cell_size - 90.0)), 89.9)
+        reach_km = index.cell_size * KM_PER_DEGREE_LAT * np.cos(np.radians(edge_lat))
+        found = min(k, len(block) - 1)
+
+        batch_size = max(1, _BATCH_ENTRIES // len(block))
+        for batch_start in range(start, end, batch_size):
+            batch = np.arange(batch_start, min(batch_start + batch_size, end))
+            exact = np.zeros(len(batch), dtype=bool)
+            if found == k > 0:
+                d = haversine_km(lat[batch, None], lon[batch, None], lat[block], lon[block])
+                d[block[None, :] == batch[:, None]] = np.inf
+                nearest = np.argpartition(d, k - 1, axis=1)[:, :k]
+                nearest_d = np.take_along_axis(d, nearest, axis=1)
+                ranking = np.argsort(nearest_d, axis=1, kind="stable")
+                nearest = np.take_along_axis(nearest, ranking, axis=1)
+                nearest_d = np.take_along_axis(nearest_d, ranking, axis=1)
+                exact = nearest_d[:, -1] <= reach_km
+
+                positions.append(order[batch[exact]])
+                counts.append(np.full(int(exact.sum()), k))
+                neighbours.append(order[block[nearest[exact]]].ravel())
+                distances.append(nearest_d[exact].ravel())
+
+            for i in np.flatnonzero(~exact):
+                own = order[batch[i]]
+                near, near_d = index.nearest(lat[batch[i]], lon[batch[i]], k=k + 1)
+                keep = np.flatnonzero(near != own)[:k]
+                positions.append([own])
+                counts.append([len(keep)])
+                neighbours.append(near[keep])
+                distances.append(near_d[keep])
+
+    def flat(parts, dtype):
+        return np.concatenate([np.asarray(part, dtype=dtype) for part in parts]) if parts else np.empty(0, dtype)
+
+    return flat(positions, np.int64), flat(counts, np.int64), flat(neighbours, np.int64), flat(distances, np.float32)
+
+
+def _chunks(index, chunk_rows):
+    """Occupied grid cells as (start, end) slices, grouped into chunks of about chunk_rows facilities."""
+    keys = index.sorted_keys
+    bounds = np.concatenate([np.flatnonzero(np.diff(keys)) + 1, [len(keys)]])
+    cells = list(zip(np.concatenate([[0], bounds[:-1]]).tolist(), bounds.tolist()))
+    chunk, rows = [], 0
+    for cell in cells:
+        chunk.append(cell)
+        rows += cell[1] - cell[0]
+        if rows >= chunk_rows:
+            yield chunk
+            chunk, rows = [], 0
+    if chunk:
+        yield chunk
+
+
+def _cell_size(latitudes, longitudes, k):
+    """Grid cell (degrees) holding about k facilities on average over the bounding box."""
+    area = max(np.ptp(latitudes) * np.ptp(longitudes), 1e-6)
+    return float(np.clip(np.sqrt(area * k / len(latitudes)), 0.01, 1.0))
+
+
+def build_proximity_graph(df, out_path, k=PROXIMITY_K, workers=PROXIMITY_BUILD_WORKERS):
+    """Compute the k nearest facilities of every facility in df and write them to out_path.
+
+    The grid cells are split into chunks processed in parallel by
+    ``workers`` processes (inline when 0); every neighbour list is the exact
+    k nearest by great-circle distance.
+    """
+    latitudes = df['latitude'].to_numpy(dtype=np.float64)
+    longitudes = df['longitude'].to_numpy(dtype=np.float64)
+    k = min(k, len(df) - 1)
+    cell_size = _cell_size(latitudes, longitudes, k)
+    _init_worker(latitudes, longitudes, cell_size)
+    chunks = list(_chunks(_index, max(1000, len(df) // max(workers * 8, 1))))
+
+    if workers <= 0:
+        results = [_cell_neighbours(chunk, k) for chunk in chunks]
+    else:
+        with process_pool(workers, initializer=_init_worker, initargs=(latitudes, longitudes, cell_size)) as pool:
+            results = list(pool.map(_cell_neighbours, chunks, [k] * len(chunks)))
+
+    positions, counts, neighbours, distances = (np.concatenate(parts) for parts in zip(*results))
+    # Chunks come back grouped by cell; order the lists by facility
+    ranking = np.argsort(positions, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(counts)])[:-1]
+    edges = concat_ranges(starts[ranking], counts[ranking])
+
+    np.savez(
+        out_path,
+        facility_ids=df[FACILITY_ID_COLUMN].to_numpy(dtype=str),
+        indptr=np.concatenate([[0], np.cumsum(counts[ranking])]),
+        indices=neighbours[edges].astype(np.int32),
+        distances=distances[edges],
+    )
+    logger.info(f"Wrote the {k} nearest neighbours of {len(df):,} facilities to {out_path}")
+
+
+if __name__ == "__main__":
+    # python proximity.py build attached_assets/Hospitals.csv proximity_graph.npz
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        from data_cache import stream_facilities
+        build_proximity_graph(stream_facilities(sys.argv[2]), sys.argv[3])
+    else:
+        sys.exit("Usage: python proximity.py build <facilities.csv> <graph.npz>")
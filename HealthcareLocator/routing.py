@@ -0,0 +1,364 @@
+import heapq
+import logging
+import math
+import os
+import sys
+import threading
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+
+import numpy as np
+from cachetools import LRUCache
+from spatial import EARTH_RADIUS_KM, SpatialIndex, haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Road graph built by "python routing.py build"; routing is off when unset
+ROAD_GRAPH_PATH = os.getenv("ROAD_GRAPH_PATH")
+
+# Origin/destination pairs whose travel times are kept per process
+ROUTE_CACHE_SIZE = int(os.getenv("ROUTE_CACHE_SIZE", "100000"))
+
+# Points further than this from any road are not routed
+SNAP_MAX_KM = 5.0
+
+# How much longer than the straight line a road route may be before ranking
+# stops searching; facilities beyond that count as unreachable
+DETOUR_FACTOR = 3.0
+
+# OSM highway values kept in the graph; *_link roads count as their parent class
+ROAD_CLASSES = [
+    'motorway', 'trunk', 'primary', 'secondary', 'tertiary', 'unclassified',
+    'residential', 'living_street', 'service', 'track', 'road',
+    'path', 'footway', 'cycleway', 'pedestrian', 'bridleway', 'steps',
+]
+
+# Travel speed in km/h per mode and road class; a mode cannot use classes it does not list
+SPEEDS_KMH = {
+    'driving': {
+        'motorway': 90, 'trunk': 70, 'primary': 55, 'secondary': 45, 'tertiary': 35,
+        'unclassified': 30, 'residential': 25, 'living_street': 10, 'service': 15,
+        'track': 15, 'road': 25,
+    },
+    'cycling': {
+        'trunk': 16, 'primary': 16, 'secondary': 16, 'tertiary': 16, 'unclassified': 15,
+        'residential': 15, 'living_street': 12, 'service': 12, 'track': 10, 'road': 14,
+        'path': 10, 'cycleway': 16, 'bridleway': 8, 'pedestrian': 6,
+    },
+    'walking': {
+        'trunk': 5, 'primary': 5, 'secondary': 5, 'tertiary': 5, 'unclassified': 5,
+        'residential': 5, 'living_street': 5, 'service': 5, 'track': 4.5, 'road': 5,
+        'path': 4.5, 'footway': 5, 'cycleway': 5, 'pedestrian': 5, 'bridleway': 4.5, 'steps': 2.5,
+    },
+}
+
+# Modes that may travel against one-way streets
+IGNORES_ONEWAY = {'walking'}
+
+
+@dataclass(frozen=True)
+class Route:
+    """Shortest path between two points for one mode of transport."""
+    seconds: float
+    meters: float
+    path: list  # (lat, lon) of every graph node along the way
+
+
+class RoadGraph:
+    """Directed road network in CSR form with per-mode edge travel times.
+
+    Edge ``e`` of node ``u`` is ``indices[indptr[u] + k]``; ``against_oneway``
+    marks reverse edges of one-way roads, usable only by walking.
+    """
+
+    def __init__(self, latitudes, longitudes, indptr, indices, length_m, road_class, against_oneway):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.length_m = np.asarray(length_m, dtype=np.float32)
+        self.road_class = np.asarray(road_class, dtype=np.uint8)
+        self.against_oneway = np.asarray(against_oneway, dtype=bool)
+
+        # Seconds per edge for each mode, infinite where the mode may not go
+        self.edge_seconds = {mode: self._edge_seconds(mode) for mode in SPEEDS_KMH}
+        self.max_speed = {mode: max(speeds.values()) / 3.6 for mode, speeds in SPEEDS_KMH.items()}
+        self.nodes = SpatialIndex(self.latitudes, self.longitudes, cell_size_deg=0.01)
+
+        self._cache = LRUCache(maxsize=ROUTE_CACHE_SIZE)
+        self._cache_lock = threading.Lock()
+
+        # memoryviews index as Python scalars, which the search loops need
+        self._indptr = memoryview(self.indptr)
+        self._indices = memoryview(self.indices)
+        self._lengths = memoryview(self.length_m)
+        self._lat = memoryview(self.latitudes)
+        self._lon = memoryview(self.longitudes)
+        self._seconds = {mode: memoryview(seconds) for mode, seconds in self.edge_seconds.items()}
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _edge_seconds(self, mode):
+        speeds = np.zeros(len(ROAD_CLASSES), dtype=np.float64)
+        for road_class, kmh in SPEEDS_KMH[mode].items():
+            speeds[ROAD_CLASSES.index(road_class)] = kmh / 3.6
+        edge_speed = speeds[self.road_class]
+        if mode not in IGNORES_ONEWAY:
+            edge_speed[self.against_oneway] = 0.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            seconds = (self.length_m / edge_speed).astype(np.float64)
+        # Zero-length edges the mode may not use would otherwise be 0/0 = NaN
+        seconds[edge_speed == 0] = np.inf
+        return seconds
+
+    def snap(self, lat, lon, max_km=SNAP_MAX_KM):
+        """(node, distance_km) of the graph node nearest to a point, or (None, None)."""
+        positions, distances = self.nodes.nearest(lat, lon, k=1)
+        if not len(positions) or distances[0] > max_km:
+            return None, None
+        return int(positions[0]), float(distances[0])
+
+    def _access_seconds(self, km, mode):
+        """Time to cover the straight line between a point and its snapped node."""
+        return km * 1000.0 / (SPEEDS_KMH[mode]['residential'] / 3.6)
+
+    def _heuristic(self, node, target, mode):
+        """Lower bound on the seconds left: straight-line distance at the mode's top speed."""
+        lat1, lat2 = math.radians(self._lat[node]), math.radians(self._lat[target])
+        half_dlat = (lat2 - lat1) / 2.0
+        half_dlon = math.radians(self._lon[target] - self._lon[node]) / 2.0
+        a = math.sin(half_dlat) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(half_dlon) ** 2
+        km = 2.0 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+        return km * 1000.0 / self.max_speed[mode]
+
+    def route(self, origin, destination, mode="driving"):
+        """Fastest Route between two (lat, lon) points by A*, or None if unreachable."""
+        source, source_km = self.snap(*origin)
+        target, target_km = self.snap(*destination)
+        if source is None or target is None:
+            return None
+
+        seconds = self._seconds[mode]
+        indptr, indices = self._indptr, self._indices
+        best = {source: 0.0}
+        previous = {source: (None, -1)}
+        heap = [(self._heuristic(source, target, mode), 0.0, source)]
+        while heap:
+            _, cost, node = heapq.heappop(heap)
+            if node == target:
+                break
+            if cost > best[node]:
+                continue
+            for edge in range(indptr[node], indptr[node + 1]):
+                step = seconds[edge]
+                if step == math.inf:
+                    continue
+                neighbour = indices[edge]
+                new_cost = cost + step
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    previous[neighbour] = (node, edge)
+                    heapq.heappush(heap, (new_cost + self._heuristic(neighbour, target, mode), new_cost, neighbour))
+        else:
+            return None
+
+        path, meters, node = [], 0.0, target
+        while node is not None:
+            path.append((self.latitudes[node], self.longitudes[node]))
+            node, edge = previous[node]
+            if edge >= 0:
+                meters += self._lengths[edge]
+        access_km = source_km + target_km
+        return Route(
+            seconds=best[target] + self._access_seconds(access_km, mode),
+            meters=meters + access_km * 1000.0,
+            path=path[::-1],
+        )
+
+    def _one_to_many(self, source, targets, mode, max_seconds):
+        """Dijkstra from source until every target is settled or max_seconds is passed."""
+        seconds = self._seconds[mode]
+        indptr, indices = self._indptr, self._indices
+        remaining = set(targets)
+        found = {}
+        best = {source: 0.0}
+        heap = [(0.0, source)]
+        while heap and remaining:
+            cost, node = heapq.heappop(heap)
+            if cost > best[node]:
+                continue
+            if max_seconds is not None and cost > max_seconds:
+                break
+            if node in remaining:
+                remaining.discard(node)
+                found[node] = cost
+            for edge in range(indptr[node], indptr[node + 1]):
+                step = seconds[edge]
+                if step == math.inf:
+                    continue
+                neighbour = indices[edge]
+                new_cost = cost + step
+                if new_cost < best.get(neighbour, math.inf):
+                    best[neighbour] = new_cost
+                    heapq.heappush(heap, (new_cost, neighbour))
+        return found
+
+    def travel_times(self, origin, destinations, mode="driving", max_seconds=None):
+        """Seconds from one (lat, lon) origin to each of many destinations.
+
+        ``destinations`` is a sequence of (lat, lon); unreachable ones (or
+        ones beyond ``max_seconds``) get infinity. One bounded Dijkstra
+        search serves the whole batch, and node-to-node results are cached
+        so repeated origin/facility pairs are not searched again.
+        """
+        result = np.full(len(destinations), np.inf)
+        source, source_km = self.snap(*origin)
+        if source is None:
+            return result
+
+        snapped = [self.snap(lat, lon) for lat, lon in destinations]
+        targets = {node for node, _ in snapped if node is not None}
+        with self._cache_lock:
+            known = {node: self._cache[(mode, source, node)] for node in targets if (mode, source, node) in self._cache}
+
+        missing = targets - known.keys()
+        if missing:
+            found = self._one_to_many(source, missing, mode, max_seconds)
+            # A search that ran to exhaustion proves the rest unreachable
+            if max_seconds is None:
+                found.update({node: math.inf for node in missing - found.keys()})
+            with self._cache_lock:
+                for node, cost in found.items():
+                    self._cache[(mode, source, node)] = cost
+            known.update(found)
+
+        for i, (node, target_km) in enumerate(snapped):
+            # Cached costs may come from searches with a larger bound
+            if node is not None and node in known and (max_seconds is None or known[node] <= max_seconds):
+                result[i] = known[node] + self._access_seconds(source_km + target_km, mode)
+        return result
+
+
+def rank_by_travel_time(graph, candidates, lat, lon, mode="driving", k=10):
+    """The k candidate facilities quickest to reach from (lat, lon), with ``travel_min``.
+
+    Candidates are typically the straight-line nearest few times k; ones the
+    mode cannot reach sort last with an infinite travel time. The search is
+    bounded by the furthest candidate's straight-line distance at the mode's
+    slowest speed times DETOUR_FACTOR, so an unreachable candidate does not
+    make it walk the whole road network.
+    """
+    latitudes = candidates['latitude'].to_numpy(dtype=np.float64)
+    longitudes = candidates['longitude'].to_numpy(dtype=np.float64)
+    destinations = list(zip(latitudes, longitudes))
+    furthest_km = float(haversine_km(lat, lon, latitudes, longitudes).max()) if len(destinations) else 0.0
+    max_seconds = furthest_km * 1000.0 / (min(SPEEDS_KMH[mode].values()) / 3.6) * DETOUR_FACTOR
+    seconds = graph.travel_times((lat, lon), destinations, mode, max_seconds=max_seconds)
+    ranked = candidates.assign(travel_min=seconds / 60.0)
+    return ranked.iloc[np.argsort(seconds, kind="stable")[:k]]
+
+
+def load_road_graph(path=ROAD_GRAPH_PATH):
+    """Load a graph written by build_road_graph."""
+    with np.load(path) as data:
+        graph = RoadGraph(**{name: data[name] for name in data.files})
+    logger.info(f"Loaded road graph with {len(graph):,} nodes and {len(graph.indices):,} edges")
+    return graph
+
+
+def _road_class(tags):
+    highway = tags.get('highway', '')
+    highway = highway[:-len('_link')] if highway.endswith('_link') else highway
+    return ROAD_CLASSES.index(highway) if highway in ROAD_CLASSES else None
+
+
+def _oneway(tags):
+    """1 for one-way along the way, -1 against it, 0 for two-way roads."""
+    value = tags.get('oneway', '')
+    if value in ('yes', 'true', '1'):
+        return 1
+    if value == '-1':
+        return -1
+    return 1 if tags.get('highway') in ('motorway', 'motorway_link') or tags.get('junction') == 'roundabout' else 0
+
+
+def _iter_elements(osm_path, tag):
+    events = ET.iterparse(osm_path, events=("start", "end"))
+    _, root = next(events)
+    for event, element in events:
+        if event != "end":
+            continue
+        if element.tag == tag:
+            yield element
+        if element.tag in ('node', 'way', 'relation'):
+            # Processed elements stay attached to the root unless removed from it
+            root.clear()
+
+
+def build_road_graph(osm_path, out_path):
+    """Build a RoadGraph file from an OSM XML extract.
+
+    Two streaming passes keep memory bounded: the first collects routable
+    ways, the second the coordinates of the nodes they use.
+    """
+    starts, ends, classes, directions = [], [], [], []
+    for way in _iter_elements(osm_path, 'way'):
+        tags = {tag.get('k'): tag.get('v') for tag in way.iter('tag')}
+        road_class = _road_class(tags)
+        if road_class is None:
+            continue
+        refs = [int(nd.get('ref')) for nd in way.iter('nd')]
+        starts.extend(refs[:-1])
+        ends.extend(refs[1:])
+        classes.extend([road_class] * (len(refs) - 1))
+        directions.extend([_oneway(tags)] * (len(refs) - 1))
+
+    starts, ends = np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+    node_ids = np.unique(np.concatenate([starts, ends]))
+    latitudes = np.full(len(node_ids), np.nan)
+    longitudes = np.full(len(node_ids), np.nan)
+    for node in _iter_elements(osm_path, 'node'):
+        position = np.searchsorted(node_ids, int(node.get('id')))
+        if position < len(node_ids) and node_ids[position] == int(node.get('id')):
+            latitudes[position] = float(node.get('lat'))
+            longitudes[position] = float(node.get('lon'))
+
+    # Drop nodes the extract references but does not contain (clipped borders)
+    located = ~np.isnan(latitudes)
+    u, v = np.searchsorted(node_ids, starts), np.searchsorted(node_ids, ends)
+    keep = located[u] & located[v]
+    remap = np.cumsum(located) - 1
+    u, v = remap[u[keep]], remap[v[keep]]
+    latitudes, longitudes, node_ids = latitudes[located], longitudes[located], node_ids[located]
+    classes = np.array(classes, dtype=np.uint8)[keep]
+    directions = np.array(directions, dtype=np.int8)[keep]
+    length_m = (haversine_km(latitudes[u], longitudes[u], latitudes[v], longitudes[v]) * 1000.0).astype(np.float32)
+
+    # Both directions of every segment; the one a one-way road forbids is flagged
+    sources = np.concatenate([u, v])
+    targets = np.concatenate([v, u])
+    against = np.concatenate([directions == -1, directions == 1])
+    order = np.argsort(sources, kind="stable")
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=len(node_ids)))])
+
+    np.savez(
+        out_path,
+        latitudes=latitudes,
+        longitudes=longitudes,
+        indptr=indptr,
+        indices=targets[order],
+        length_m=np.concatenate([length_m, length_m])[order],
+        road_class=np.concatenate([classes, classes])[order],
+        against_oneway=against[order],
+    )
+    logger.info(f"Wrote {len(node_ids):,} nodes and {len(sources):,} edges to {out_path}")
+
+
+if __name__ == "__main__":
+    # python routing.py build nigeria-latest.osm road_graph.npz
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) == 4 and sys.argv[1] == "build":
+        build_road_graph(sys.argv[2], sys.argv[3])
+    else:
+        sys.exit("Usage: python routing.py build <extract.osm> <graph.npz>")
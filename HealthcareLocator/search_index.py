@@ -0,0 +1,207 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+from utils import SEARCH_COLUMNS, concat_ranges
+
+NGRAM = 3
+_EMPTY = np.empty(0, dtype=np.int64)
+_WORD = re.compile(r"\w+")
+
+
+def _grams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+def _intersect(arrays):
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for other in arrays[1:]:
+        if not len(result):
+            break
+        result = np.intersect1d(result, other, assume_unique=True)
+    return result
+
+
+class _FieldIndex:
+    """Trigram and word-prefix postings over the distinct values of one column.
+
+    Postings hold value ids rather than rows, so State and LGA (a few hundred
+    distinct values) stay tiny; ``rows`` expands value ids to row positions.
+
+    Given the index of a previous version of the column, values it already
+    knows keep their ids and postings and only new values are tokenized.
+    Values that no longer occur keep their postings but match no rows.
+    """
+
+    def __init__(self, series, previous=None):
+        known = previous.uniques if previous is not None else pd.Index([], dtype=object)
+        seen = known.get_indexer(series) >= 0
+        new_values = pd.unique(series[~seen & series.notna().to_numpy()].astype(object))
+        self.uniques = known.append(pd.Index(new_values, dtype=object))
+        codes = self.uniques.get_indexer(series)
+        self.codes = codes
+
+        first_new = len(known)
+        self.values = (previous.values if previous is not None else []) + [
+            str(value).lower() for value in new_values
+        ]
+
+        order = np.argsort(codes, kind="stable")
+        missing = int((codes < 0).sum())
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.values))
+        self.row_order = order[missing:]
+        self.row_starts = np.concatenate([[0], np.cumsum(counts)])
+        self.live_values = int(np.count_nonzero(counts))
+
+        postings = {}
+        words = []
+        for value_id in range(first_new, len(self.values)):
+            value = self.values[value_id]
+            for gram in _grams(value):
+                postings.setdefault(gram, []).append(value_id)
+            for word in set(_WORD.findall(value)):
+                words.append((word, value_id))
+
+        if previous is None:
+            self.postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        else:
+            # Copy-on-write: the previous version stays usable by readers
+            self.postings = dict(previous.postings)
+            for gram, ids in postings.items():
+                ids = np.array(ids, dtype=np.int64)
+                self.postings[gram] = np.concatenate([self.postings[gram], ids]) if gram in self.postings else ids
+            words += zip(previous.words, previous.word_ids.tolist())
+
+        words.sort()
+        self.words = [word for word, _ in words]
+        self.word_ids = np.array([value_id for _, value_id in words], dtype=np.int64)
+
+    def rows(self, value_ids):
+        """Row positions of the given value ids, grouped in value_ids order."""
+        value_ids = np.asarray(value_ids, dtype=np.int64)
+        starts = self.row_starts[value_ids]
+        return self.row_order[concat_ranges(starts, self.row_starts[value_ids + 1] - starts)]
+
+    def substring(self, term):
+        """Value ids containing term, the same rows as str.contains on the column."""
+        if len(term) < NGRAM:
+            # Too short for the trigram postings; scan the distinct values
+            return np.array([v for v, value in enumerate(self.values) if term in value], dtype=np.int64)
+        lists = [self.postings.get(gram, _EMPTY) for gram in _grams(term)]
+        candidates = _intersect(lists)
+        if len(term) == NGRAM:
+            return candidates
+        # Trigram hits are a superset; confirm the actual substring
+        return np.array([v for v in candidates if term in self.values[v]], dtype=np.int64)
+
+    def contains(self, term, value_ids):
+        """Mask of the value_ids that substring(term) would return."""
+        matches = (term in self.values[v] for v in value_ids)
+        return np.fromiter(matches, dtype=bool, count=len(value_ids))
+
+    def prefix(self, term):
+        """Value ids with a word starting with term."""
+        lo = bisect_left(self.words, term)
+        hi = bisect_left(self.words, term + "\uffff")
+        return np.unique(self.word_ids[lo:hi])
+
+    def fuzzy(self, term, max_typos=1):
+        """Value ids sharing enough trigrams with term, with their shared-gram counts."""
+        grams = _grams(term)
+        lists = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not lists:
+            return _EMPTY, _EMPTY
+        value_ids, counts = np.unique(np.concatenate(lists), return_counts=True)
+        # One typo spoils at most NGRAM trigrams
+        keep = counts >= max(1, len(grams) - NGRAM * max_typos)
+        return value_ids[keep], counts[keep]
+
+
+class TextSearchIndex:
+    """Inverted trigram index over facility name, state and LGA."""
+
+    def __init__(self, df, previous=None):
+        self.size = len(df)
+        self.fields = {
+            col: _FieldIndex(df[col], _reusable(previous.fields[col]) if previous is not None else None)
+            for col in SEARCH_COLUMNS
+        }
+        self.names = self.fields['facility_name']
+
+    def search(self, search_term, candidates=None, ranked=False, fuzzy=False, max_typos=1):
+        """Row positions whose name, state or LGA contain search_term.
+
+        ``candidates`` restricts the result to those positions. ``ranked``
+        orders name-prefix and word-prefix matches first. ``fuzzy`` falls back
+        to trigram-overlap matching (ranked by overlap) when nothing matches
+        exactly.
+        """
+        term = search_term.strip().lower()
+        if not term:
+            return np.arange(self.size) if candidates is None else candidates
+
+        positions = np.unique(np.concatenate([
+            field.rows(field.substring(term)) for field in self.fields.values()
+        ]))
+        if candidates is not None:
+            positions = np.intersect1d(positions, candidates, assume_unique=True)
+
+        if not len(positions) and fuzzy and len(term) >= NGRAM:
+            return self._fuzzy(term, candidates, max_typos)
+        if ranked:
+            return positions[np.argsort(-self._scores(term, positions), kind="stable")]
+        return positions
+
+    def refine(self, search_term, positions):
+        """The positions among ``positions`` that search(search_term) would return.
+
+        For narrowing the result of a term that search_term extends (see
+        filter_cache.py): only the values found at those positions are checked,
+        so the cost follows the size of the earlier result, not the dataset.
+        """
+        term = search_term.strip().lower()
+        if not term:
+            return positions
+        keep = np.zeros(len(positions), dtype=bool)
+        for field in self.fields.values():
+            codes = field.codes[positions]
+            value_ids = np.unique(codes[codes >= 0])
+            keep |= np.isin(codes, value_ids[field.contains(term, value_ids)])
+        return positions[keep]
+
+    def _scores(self, term, positions):
+        """2 for a name starting with term, 1 for a name word starting with it, else 0."""
+        scores = np.zeros(len(positions), dtype=np.int64)
+        word_prefix = set(self.names.prefix(term).tolist())
+        for i, value_id in enumerate(self.names.codes[positions]):
+            if value_id < 0:
+                continue
+            if self.names.values[value_id].startswith(term):
+                scores[i] = 2
+            elif value_id in word_prefix:
+                scores[i] = 1
+        return scores
+
+    def _fuzzy(self, term, candidates, max_typos):
+        value_ids, counts = self.names.fuzzy(term, max_typos)
+        ranking = np.argsort(-counts, kind="stable")
+        positions = self.names.rows(value_ids[ranking])
+        if candidates is not None:
+            positions = positions[np.isin(positions, candidates)]
+        return positions
+
+
+def _reusable(field):
+    """field, or None once most of its values no longer occur and a rebuild is cheaper."""
+    return field if field.live_values * 2 >= len(field.values) else None
+
+
+def build_search_index(df, previous=None):
+    """Build a TextSearchIndex over the cleaned facility frame.
+
+    ``previous`` is the index of an earlier version of the dataset whose
+    postings are reused for unchanged values (see dataset_manager.py).
+    """
+    return TextSearchIndex(df, previous)
@@ -0,0 +1,66 @@
+import logging
+import os
+import sys
+
+import pyarrow as pa
+from data_cache import ARROW_TYPES, load_cached_data, write_arrow
+
+logger = logging.getLogger(__name__)
+
+# Arrow IPC file shared by every server process on the host (e.g. under
+# /dev/shm); unset to have each process load its own copy of the dataset
+SHARED_DATASET_PATH = os.getenv("SHARED_DATASET_PATH")
+
+
+def publish_dataset(csv_path, path=SHARED_DATASET_PATH):
+    """Clean csv_path once and publish it at path for other processes to attach.
+
+    The file is replaced atomically: processes attached to the previous
+    version keep reading it until they attach again.
+    """
+    df = load_cached_data(csv_path)
+    write_arrow(df, path)
+    logger.info(f"Published {len(df):,} facilities to {path}")
+    return shared_dataset_version(path)
+
+
+def shared_dataset_version(path=SHARED_DATASET_PATH):
+    """Identify the published file; changes whenever it is republished."""
+    stat = os.stat(path)
+    return f"{stat.st_ino:x}-{stat.st_mtime_ns:x}"
+
+
+def attach_dataset(path=SHARED_DATASET_PATH):
+    """Map the published dataset into this process without copying it.
+
+    Numeric columns and text columns are views of the page cache, which
+    every process attached to the same file shares; only the bit-packed
+    booleans and categorical codes are materialised per process.
+    """
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    # split_blocks keeps each column in its own (zero-copy) block; text
+    # columns stay in the mapped Arrow buffers instead of becoming Python objects
+    return table.to_pandas(split_blocks=True, types_mapper=ARROW_TYPES.get)
+
+
+def ensure_published(csv_path, path=SHARED_DATASET_PATH):
+    """Version of the published dataset, publishing it first if missing or older than csv_path.
+
+    Processes noticing the same edit may each republish; the atomic replace
+    makes that redundant work rather than a conflict.
+    """
+    if not os.path.exists(path) or os.stat(path).st_mtime_ns < os.stat(csv_path).st_mtime_ns:
+        publish_dataset(csv_path, path)
+    return shared_dataset_version(path)
+
+
+if __name__ == "__main__":
+    # Loader step: python shared_dataset.py publish [path/to/Hospitals.csv]
+    logging.basicConfig(level=logging.INFO)
+    if not SHARED_DATASET_PATH:
+        sys.exit("Set SHARED_DATASET_PATH to the file to publish")
+    if sys.argv[1:2] == ["publish"]:
+        publish_dataset(sys.argv[2] if len(sys.argv) > 2 else "attached_assets/Hospitals.csv")
+    else:
+        sys.exit("Usage: python shared_dataset.py publish [csv_path]")
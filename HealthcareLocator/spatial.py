@@ -0,0 +1,103 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = np.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between points given in degrees."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2 +
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Uniform lat/lon grid over facility coordinates.
+
+    Points are sorted by grid cell so that every row of cells inside a query
+    box maps to one contiguous slice of the sorted arrays. Results are
+    positional (``df.iloc``) indices into the frame the index was built from.
+    """
+
+    def __init__(self, latitudes, longitudes, cell_size_deg=0.1):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.cell_size = float(cell_size_deg)
+        self.n_cols = int(np.ceil(360.0 / self.cell_size)) + 1
+
+        rows, cols = self._cell(self.latitudes, self.longitudes)
+        keys = rows * self.n_cols + cols
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+        self.sorted_lat = self.latitudes[self.order]
+        self.sorted_lon = self.longitudes[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def _cell(self, lat, lon):
+        rows = np.floor((np.asarray(lat) + 90.0) / self.cell_size).astype(np.int64)
+        cols = np.floor((np.asarray(lon) + 180.0) / self.cell_size).astype(np.int64)
+        return rows, cols
+
+    def _candidates(self, lat, lon, radius_km):
+        """Sorted-array slices covering the bounding box of a query circle."""
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        max_lat = min(abs(lat) + dlat, 89.9)
+        dlon = min(dlat / np.cos(np.radians(max_lat)), 180.0)
+
+        row_lo, col_lo = self._cell(max(lat - dlat, -90.0), max(lon - dlon, -180.0))
+        row_hi, col_hi = self._cell(min(lat + dlat, 90.0), min(lon + dlon, 180.0))
+
+        starts = np.arange(row_lo, row_hi + 1) * self.n_cols
+        lo = np.searchsorted(self.sorted_keys, starts + col_lo, side="left")
+        hi = np.searchsorted(self.sorted_keys, starts + col_hi, side="right")
+        slices = [np.arange(a, b) for a, b in zip(lo, hi) if b > a]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def within_radius(self, lat, lon, radius_km):
+        """Return (positions, distances_km) of points within radius_km, nearest first."""
+        candidates = self._candidates(lat, lon, radius_km)
+        distances = haversine_km(lat, lon, self.sorted_lat[candidates], self.sorted_lon[candidates])
+        keep = distances <= radius_km
+        candidates, distances = candidates[keep], distances[keep]
+        ranking = np.argsort(distances, kind="stable")
+        return self.order[candidates[ranking]], distances[ranking]
+
+    def nearest(self, lat, lon, k=10):
+        """Return (positions, distances_km) of the k points closest to (lat, lon)."""
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # Grow the search circle until it holds k points; everything inside
+        # the circle has been scanned, so its k closest are the global k closest.
+        radius_km = self.cell_size * KM_PER_DEGREE_LAT
+        while True:
+            positions, distances = self.within_radius(lat, lon, radius_km)
+            if len(positions) >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+                return positions[:k], distances[:k]
+            radius_km *= 2.0
+
+
+def build_spatial_index(df, cell_size_deg=0.1):
+    """Build a SpatialIndex over the cleaned facility coordinates."""
+    return SpatialIndex(df['latitude'].to_numpy(), df['longitude'].to_numpy(), cell_size_deg)
+
+
+def nearest_facilities(df, index, lat, lon, k=10, radius_km=None):
+    """Facilities closest to a point with a ``distance_km`` column, nearest first.
+
+    With ``radius_km`` every facility inside the radius is returned instead of
+    the k nearest.
+    """
+    if radius_km is not None:
+        positions, distances = index.within_radius(lat, lon, radius_km)
+    else:
+        positions, distances = index.nearest(lat, lon, k)
+    return df.iloc[positions].assign(distance_km=distances)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from utils import SERVICE_COLUMNS, flag_mask, pack_flags, required_bits
+
+# Dimensions the overview can be sliced by
+CUBE_DIMENSIONS = ['State', 'Local_Government_Area', 'facility_type_display']
+
+# Overview counters and the service columns they sum
+STAT_COLUMNS = {
+    'with_electricity': 'phcn_electricity',
+    'with_water': 'improved_water_supply',
+    'with_emergency': 'emergency_transport'
+}
+
+
+def build_stats_cube(df):
+    """Aggregate facility counts per state x LGA x type x service combination.
+
+    ``service_mask`` packs the sidebar services (bit i is the i-th entry of
+    SERVICE_COLUMNS), so service filters select cells by bitmask instead of
+    scanning rows.
+    """
+    cells = pd.DataFrame({dim: df[dim].to_numpy() for dim in CUBE_DIMENSIONS})
+    cells['service_mask'] = pack_flags(df, SERVICE_COLUMNS.values())
+    cells['facilities'] = 1
+    for stat, column in STAT_COLUMNS.items():
+        cells[stat] = flag_mask(df, column).astype(np.int64)
+
+    return (
+        cells.groupby(CUBE_DIMENSIONS + ['service_mask'], observed=True, dropna=False, sort=False)
+        .sum()
+        .reset_index()
+    )
+
+
+def update_stats_cube(cube, removed, added):
+    """The cube after removing the rows of ``removed`` and adding those of ``added``.
+
+    Cells are plain sums, so a row-level diff patches the cube without
+    re-aggregating the rest of the dataset.
+    """
+    delta = build_stats_cube(removed)
+    counters = ['facilities'] + list(STAT_COLUMNS)
+    delta[counters] = -delta[counters]
+    cells = pd.concat([cube, delta, build_stats_cube(added)], ignore_index=True)
+    cells = (
+        cells.groupby(CUBE_DIMENSIONS + ['service_mask'], dropna=False, sort=False)
+        .sum()
+        .reset_index()
+    )
+    return cells[cells['facilities'] > 0].reset_index(drop=True)
+
+
+def cube_facility_stats(cube, facility_type=None, services=None, state=None, lga=None):
+    """Overview statistics for a filter combination, summed from cube cells.
+
+    Returns the same keys as utils.get_facility_stats.
+    """
+    mask = np.ones(len(cube), dtype=bool)
+    if facility_type and facility_type != "All":
+        mask &= (cube['facility_type_display'] == facility_type).to_numpy()
+    if state:
+        mask &= (cube['State'] == state).to_numpy()
+    if lga:
+        mask &= (cube['Local_Government_Area'] == lga).to_numpy()
+    if services:
+        required = required_bits(SERVICE_COLUMNS, services)
+        mask &= (cube['service_mask'].to_numpy() & required) == required
+
+    cells = cube[mask]
+    facility_types = cells.groupby('facility_type_display', observed=True)['facilities'].sum()
+    stats = {
+        'total_facilities': int(cells['facilities'].sum()),
+        'facility_types': facility_types[facility_types > 0].sort_values(ascending=False).to_dict(),
+        'states': 36,  # Fixed number of states in Nigeria
+        'lgas': cells['Local_Government_Area'].nunique(),
+    }
+    for stat in STAT_COLUMNS:
+        stats[stat] = int(cells[stat].sum())
+    return stats
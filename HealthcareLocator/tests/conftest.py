@@ -0,0 +1,50 @@
+"""Shared fixtures: a small generated facility dataset in the Hospitals.csv layout."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cache import stream_facilities
+from utils import BOOL_COLUMNS, FACILITY_ID_COLUMN
+
+N_FACILITIES = 600
+
+STATES = {
+    "Lagos": ["Ikeja", "Epe", "Badagry"],
+    "Kano": ["Dala", "Fagge"],
+    "Rivers": ["Bonny", "Okrika", "Obio/Akpor"],
+}
+TYPES = ["Primary Health Center", "General Hospital", "Dispensary", "Maternity Home"]
+NAME_WORDS = ["Saint", "Mercy", "Unity", "Hope", "Ikeja", "Dala", "Model", "Comprehensive", "100%", "Cottage_Care"]
+
+
+def facility_rows(n=N_FACILITIES, seed=7):
+    """Raw facility rows, as text like the CSV, deterministic per seed."""
+    rng = np.random.default_rng(seed)
+    states = rng.choice(list(STATES), n)
+    types = rng.choice(TYPES, n)
+    rows = {
+        FACILITY_ID_COLUMN: [f"f{i:04d}" for i in range(n)],
+        'facility_name': [f"{' '.join(rng.choice(NAME_WORDS, 2))} {facility_type}" for facility_type in types],
+        'facility_type_display': types,
+        'State': states,
+        'Local_Government_Area': [rng.choice(STATES[state]) for state in states],
+        # On a 0.1 degree grid offset by 0.05, so no facility sits on a whole-degree viewport edge
+        'latitude': np.round(rng.uniform(4.5, 13.5, n), 1) + 0.05,
+        'longitude': np.round(rng.uniform(3.0, 14.0, n), 1) + 0.05,
+    }
+    for column in BOOL_COLUMNS:
+        rows[column] = rng.choice(["TRUE", "FALSE", ""], n, p=[0.5, 0.4, 0.1])
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope="session")
+def facilities_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp("facilities") / "facilities.csv"
+    facility_rows().to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope="session")
+def facilities(facilities_csv):
+    """The fixture CSV as the app loads it (cleaned and compacted)."""
+    return stream_facilities(facilities_csv, workers=0)
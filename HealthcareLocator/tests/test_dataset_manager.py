@@ -0,0 +1,87 @@
+"""dataset_manager: row diffs by facility id and snapshots patched from them."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import facility_rows
+from dataset_manager import DatasetManager, build_snapshot, diff_datasets, row_hashes
+from stats_cube import cube_facility_stats
+from utils import FACILITY_ID_COLUMN
+
+
+def _changed_rows():
+    """The fixture rows with 10 removed, 5 renamed and 3 added."""
+    rows = facility_rows()
+    rows = rows.drop(index=range(10, 20))
+    rows.loc[30:34, 'facility_name'] = "Renamed Clinic"
+    added = facility_rows(3, seed=11).assign(**{FACILITY_ID_COLUMN: ["new0", "new1", "new2"]})
+    return pd.concat([rows, added], ignore_index=True)
+
+
+def test_diff_counts(facilities):
+    snapshot = build_snapshot("v1", facilities)
+    added = facilities.iloc[:5].assign(**{FACILITY_ID_COLUMN: [f"x{i}" for i in range(5)]})
+    new = pd.concat([facilities.iloc[20:], added])
+    new.loc[new.index[:3], 'latitude'] += 0.5
+
+    diff = diff_datasets(snapshot, new, row_hashes(new))
+
+    assert (diff.added, diff.updated, diff.removed) == (5, 3, 20)
+    assert len(diff.inserted) == 8 and len(diff.deleted) == 23
+    assert diff_datasets(snapshot, facilities, snapshot.row_hashes).empty
+
+
+def test_duplicate_ids_cannot_be_diffed(facilities):
+    snapshot = build_snapshot("v1", facilities)
+    duplicated = pd.concat([facilities, facilities.iloc[:2]])
+    assert diff_datasets(snapshot, duplicated, row_hashes(duplicated)) is None
+
+
+def test_refresh_patches_like_a_rebuild(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "facilities.csv"
+    facility_rows().to_csv(path, index=False)
+    manager = DatasetManager(str(path), check_interval=0)
+    before = manager.current()
+
+    _changed_rows().to_csv(path, index=False)
+    after = manager.refresh()
+
+    assert after.version != before.version
+    assert (after.diff.added, after.diff.updated, after.diff.removed) == (3, 5, 10)
+    rebuilt = build_snapshot(after.version, after.df)
+    assert after.locations.lga_counts == rebuilt.locations.lga_counts
+    for filters in [{}, {'state': "Kano"}, {'services': ["Maternal Health"]}]:
+        assert cube_facility_stats(after.stats_cube, **filters) == cube_facility_stats(rebuilt.stats_cube, **filters)
+    for term in ["renamed", "mercy", "ik"]:
+        np.testing.assert_array_equal(
+            after.filter_index.text.search(term), rebuilt.filter_index.text.search(term)
+        )
+
+
+def test_unchanged_rows_keep_the_snapshot(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "facilities.csv"
+    facility_rows().to_csv(path, index=False)
+    manager = DatasetManager(str(path), check_interval=0)
+    before = manager.current()
+
+    # Touched, not changed
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1))
+    after = manager.refresh()
+
+    assert after.version != before.version and after.diff.empty
+    assert after.filter_index is before.filter_index and after.df is before.df
+
+
+def test_failed_first_load_is_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "facilities.csv"
+    manager = DatasetManager(str(path), check_interval=0)
+    with pytest.raises(FileNotFoundError):
+        manager.current()
+
+    facility_rows().to_csv(path, index=False)
+    assert len(manager.current().df) == len(facility_rows())
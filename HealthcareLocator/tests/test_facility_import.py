@@ -0,0 +1,34 @@
+"""The importer writes the same facility ids the app derives from the CSV."""
+import pandas as pd
+
+from data_cache import stream_facilities
+from facility_import import iter_facility_chunks
+from utils import BOOL_COLUMNS, FACILITY_ID_COLUMN
+
+
+def _write_csv(path, ids):
+    n = len(ids)
+    pd.DataFrame({
+        FACILITY_ID_COLUMN: ids,
+        'facility_name': [f"Facility {i}" for i in range(n)],
+        'facility_type_display': ["Health Post"] * n,
+        'State': ["Kano"] * n,
+        'Local_Government_Area': ["Dala"] * n,
+        'latitude': [10.0 + i / 100 for i in range(n)],
+        'longitude': [8.0 + i / 100 for i in range(n)],
+        **{col: [["TRUE", "", "FALSE"][i % 3] for i in range(n)] for col in BOOL_COLUMNS},
+    }).to_csv(path, index=False)
+
+
+def test_numeric_ids_with_blanks_match_the_app(tmp_path):
+    # Chunks holding a blank id would be inferred as float ("1003.0") if parsed by type
+    path = tmp_path / "facilities.csv"
+    _write_csv(path, [1000, 1001, 1002, None, 1004, 1005, None, 1007, "0042"])
+
+    imported = pd.concat(iter_facility_chunks(path, chunksize=3))['id']
+    app = stream_facilities(path, chunksize=3, workers=0)[FACILITY_ID_COLUMN]
+
+    assert imported.tolist() == app.astype(str).tolist()
+    assert imported.iloc[0] == "1000" and imported.iloc[-1] == "0042"
+    # Blank ids fall back to the row hash
+    assert imported.iloc[3].startswith("h")
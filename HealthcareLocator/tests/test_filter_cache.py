@@ -0,0 +1,57 @@
+"""filter_cache: cached and narrowed results equal uncached filtering."""
+import numpy as np
+import pytest
+
+from filter_cache import FilterResultCache, _narrowable, filter_key, filter_positions
+from filter_index import build_filter_index
+from utils import _filter_positions
+
+FILTERS = [
+    {},
+    {'facility_type': "General Hospital"},
+    {'services': ["Maternal Health", "Family Planning"]},
+    {'state': "Rivers", 'lga': "Obio/Akpor"},
+]
+
+
+@pytest.fixture(scope="module")
+def index(facilities):
+    return build_filter_index(facilities)
+
+
+def test_equivalent_filters_share_a_key():
+    assert filter_key("All", ["b", "a", "a"], "", None, "  Mercy ") == filter_key(None, ["a", "b"], None, "", "mercy")
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_typing_a_term_narrows_cached_results(facilities, index, filters):
+    cache = FilterResultCache()
+    for length in range(1, len("mercy hope") + 1):
+        term = "mercy hope"[:length]
+        if length > 1:
+            # Each keystroke, across the trigram length too, narrows the previous result
+            assert _narrowable(filter_key(search_term=term, **filters), "v1", cache) is not None
+        positions = filter_positions(index, "v1", search_term=term, cache=cache, **filters)
+        np.testing.assert_array_equal(positions, _filter_positions(facilities, search_term=term, **filters))
+
+
+def test_repeated_filters_are_cache_hits(facilities, index):
+    cache = FilterResultCache()
+    first = filter_positions(index, "v1", state="Lagos", search_term="ik", cache=cache)
+
+    assert filter_positions(index, "v1", state="Lagos", search_term=" IK", cache=cache) is first
+    assert not first.flags.writeable
+    # Another dataset version never sees these entries
+    assert filter_positions(index, "v2", state="Lagos", search_term="ik", cache=cache) is not first
+
+
+def test_entry_and_memory_limits():
+    by_count = FilterResultCache(max_entries=2)
+    for i in range(3):
+        by_count.put("v1", i, np.arange(10))
+    assert len(by_count) == 2 and by_count.get("v1", 0) is None
+
+    by_size = FilterResultCache(max_mb=0.001)
+    positions = np.arange(10_000)
+    np.testing.assert_array_equal(by_size.put("v1", "big", positions), positions)
+    assert by_size.get("v1", "big") is None
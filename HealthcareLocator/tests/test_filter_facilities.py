@@ -0,0 +1,29 @@
+"""utils.filter_facilities: the indexed, cached and plain paths agree."""
+import inspect
+
+import pytest
+
+import postgis_backend
+import utils
+from filter_index import build_filter_index
+from utils import filter_facilities
+
+
+@pytest.fixture(autouse=True)
+def in_memory(monkeypatch):
+    monkeypatch.setattr(utils, "FACILITY_BACKEND", "pandas")
+
+
+def test_backends_share_a_signature():
+    assert inspect.signature(postgis_backend.filter_facilities) == inspect.signature(utils.filter_facilities)
+
+
+def test_bounds_and_limit(facilities):
+    bounds = {'_southWest': {'lat': 6.0, 'lng': 3.0}, '_northEast': {'lat': 9.0, 'lng': 8.0}}
+    index = build_filter_index(facilities)
+    plain = filter_facilities(facilities, state="Lagos", bounds=bounds)
+    indexed = filter_facilities(facilities, state="Lagos", index=index, version="v1", bounds=bounds)
+
+    assert len(plain) and plain.index.equals(indexed.index)
+    assert plain['latitude'].between(6.0, 9.0).all() and plain['longitude'].between(3.0, 8.0).all()
+    assert filter_facilities(facilities, state="Lagos", bounds=bounds, limit=3).index.equals(plain.index[:3])
@@ -0,0 +1,143 @@
+"""postgis_backend checked against the in-memory queries on the same facilities.
+
+Needs a Postgres with PostGIS and pg_trgm at DATABASE_URL, and replaces the
+contents of its facilities table, so point it at a scratch database:
+
+    DATABASE_URL=postgresql://localhost/locator_test python -m pytest tests
+"""
+import os
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+import postgis_backend
+import utils
+from database import init_db
+from facility_import import import_facilities
+from spatial import build_spatial_index, nearest_facilities
+from utils import FACILITY_ID_COLUMN, filter_facilities, load_and_clean_data
+
+pytestmark = pytest.mark.skipif(not os.getenv("DATABASE_URL"), reason="DATABASE_URL is not set")
+
+# Spheroid (PostGIS) and sphere (haversine) distances differ by well under this
+DISTANCE_RTOL = 0.01
+
+
+@pytest.fixture(scope="module")
+def facilities_df(facilities_csv):
+    """The cleaned fixture frame, also loaded into the facilities table."""
+    init_db()
+    engine = postgis_backend._engine()
+    postgis_backend.init_postgis_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM facilities"))
+    import_facilities(facilities_csv, engine)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("ANALYZE facilities"))
+    return load_and_clean_data(facilities_csv)
+
+
+@pytest.fixture(autouse=True)
+def in_memory_reference(monkeypatch):
+    """utils.filter_facilities answers from the frame even when run under FACILITY_BACKEND=postgis."""
+    monkeypatch.setattr(utils, "FACILITY_BACKEND", "pandas")
+
+
+def _ids(frame):
+    return set(frame[FACILITY_ID_COLUMN])
+
+
+FILTERS = [
+    {},
+    {'facility_type': "General Hospital"},
+    {'services': ["Maternal Health", "Emergency Transport"]},
+    {'state': "Lagos"},
+    {'state': "Rivers", 'lga': "Obio/Akpor"},
+    {'facility_type': "Dispensary", 'services': ["Family Planning"], 'state': "Kano"},
+]
+
+SEARCH_TERMS = ["mercy", "  Unity ", "MODEL General", "ik", "a", "obio/", "100%", "e_c", "lagos", "no such facility"]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_structural_filters_match_pandas(facilities_df, filters):
+    expected = filter_facilities(facilities_df, **filters)
+    result = postgis_backend.filter_facilities(**filters)
+    assert _ids(result) == _ids(expected)
+
+
+@pytest.mark.parametrize("search_term", SEARCH_TERMS)
+def test_trigram_search_matches_pandas(facilities_df, search_term):
+    expected = filter_facilities(facilities_df, search_term=search_term)
+    result = postgis_backend.filter_facilities(search_term=search_term)
+    assert _ids(result) == _ids(expected)
+
+
+@pytest.mark.parametrize("search_term", ["mercy", "ik"])
+@pytest.mark.parametrize("filters", FILTERS[1:])
+def test_search_with_filters_matches_pandas(facilities_df, filters, search_term):
+    expected = filter_facilities(facilities_df, search_term=search_term, **filters)
+    result = postgis_backend.filter_facilities(search_term=search_term, **filters)
+    assert _ids(result) == _ids(expected)
+
+
+@pytest.mark.parametrize("search_term", SEARCH_TERMS)
+def test_stats_count_every_match(facilities_df, search_term):
+    expected = filter_facilities(facilities_df, search_term=search_term)
+    stats = postgis_backend.get_facility_stats(search_term=search_term)
+    assert stats['total_facilities'] == len(expected)
+    assert stats['lgas'] == expected['Local_Government_Area'].nunique()
+
+
+@pytest.mark.parametrize("south, west, north, east", [(6, 3, 9, 8), (4, 2, 14, 15), (10, 10, 11, 11)])
+@pytest.mark.parametrize("filters", FILTERS[:3])
+def test_bounds_match_pandas(facilities_df, filters, south, west, north, east):
+    bounds = {'_southWest': {'lat': south, 'lng': west}, '_northEast': {'lat': north, 'lng': east}}
+    expected = filter_facilities(facilities_df, **filters, bounds=bounds)
+    result = postgis_backend.filter_facilities(**filters, bounds=bounds)
+    assert _ids(result) == _ids(expected)
+
+
+def test_backend_setting_dispatches_to_postgis(facilities_df, monkeypatch):
+    expected = filter_facilities(facilities_df, search_term="mercy", state="Lagos")
+    monkeypatch.setattr(utils, "FACILITY_BACKEND", "postgis")
+    result = filter_facilities(None, search_term="mercy", state="Lagos")
+    assert _ids(result) == _ids(expected)
+
+
+def test_limit_caps_the_map_query(facilities_df):
+    result = postgis_backend.filter_facilities(limit=25)
+    assert len(result) == 25
+    assert _ids(result) <= _ids(facilities_df)
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [(6.5, 3.4, 150.0), (9.0, 8.5, 300.0), (12.0, 8.5, 40.0)])
+def test_radius_matches_pandas(facilities_df, lat, lon, radius_km):
+    within = nearest_facilities(
+        facilities_df, build_spatial_index(facilities_df), lat, lon, radius_km=radius_km * (1 + DISTANCE_RTOL)
+    )
+    result = postgis_backend.nearest_facilities(lat, lon, radius_km=radius_km)
+
+    # Facilities within the tolerance of the edge may fall either side of it
+    certain = within[within['distance_km'] <= radius_km * (1 - DISTANCE_RTOL)]
+    assert _ids(certain) <= _ids(result) <= _ids(within)
+    assert result['distance_km'].is_monotonic_increasing
+    expected_km = within.set_index(FACILITY_ID_COLUMN)['distance_km'].loc[result[FACILITY_ID_COLUMN]]
+    np.testing.assert_allclose(result['distance_km'], expected_km, rtol=DISTANCE_RTOL)
+
+
+@pytest.mark.parametrize("lat, lon", [(6.5, 3.4), (9.0, 8.5), (4.0, 15.0)])
+@pytest.mark.parametrize("k", [1, 10, 50])
+def test_nearest_matches_pandas(facilities_df, lat, lon, k):
+    index = build_spatial_index(facilities_df)
+    expected = nearest_facilities(facilities_df, index, lat, lon, k=k)
+    result = postgis_backend.nearest_facilities(lat, lon, k=k)
+
+    assert len(result) == k
+    assert result['distance_km'].is_monotonic_increasing
+    np.testing.assert_allclose(result['distance_km'], expected['distance_km'], rtol=DISTANCE_RTOL)
+    # Only near-ties at the k-th distance may differ
+    cutoff = expected['distance_km'].iloc[-1] * (1 + DISTANCE_RTOL)
+    reachable = nearest_facilities(facilities_df, index, lat, lon, radius_km=cutoff)
+    assert _ids(result) <= _ids(reachable)
@@ -0,0 +1,78 @@
+"""proximity: exact neighbour lists, bound to changed or duplicated datasets by facility id."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from proximity import ALTERNATIVE_SERVICES, build_proximity_graph, load_proximity_graph
+from spatial import haversine_km
+from utils import FACILITY_ID_COLUMN, flag_mask
+
+K = 8
+
+
+def _build(df, directory):
+    path = str(directory / "proximity.npz")
+    build_proximity_graph(df, path, k=K, workers=0)
+    return path
+
+
+@pytest.fixture(scope="module")
+def graph_path(facilities, tmp_path_factory):
+    return _build(facilities, tmp_path_factory.mktemp("proximity"))
+
+
+def test_neighbours_are_the_k_nearest(facilities, graph_path):
+    graph = load_proximity_graph(facilities, graph_path)
+    latitudes, longitudes = facilities['latitude'].to_numpy(), facilities['longitude'].to_numpy()
+
+    assert len(graph) == len(facilities)
+    for position in range(0, len(facilities), 37):
+        positions, distances = graph.neighbours(position)
+        expected = np.sort(np.delete(haversine_km(latitudes[position], longitudes[position], latitudes, longitudes),
+                                     position))[:K]
+        assert position not in positions
+        np.testing.assert_allclose(distances, expected, rtol=1e-5)
+
+
+def test_nearest_with_services(facilities, graph_path):
+    graph = load_proximity_graph(facilities, graph_path)
+    wanted = {ALTERNATIVE_SERVICES["Emergency Transport"], ALTERNATIVE_SERVICES["C-Section"]}
+    offers = np.logical_and.reduce([flag_mask(facilities, column) for column in wanted])
+
+    for position in range(0, len(facilities), 41):
+        positions, distances = graph.nearest_with(position, wanted, n=3)
+        neighbours = graph.neighbours(position)[0]
+        assert offers[positions].all()
+        np.testing.assert_array_equal(positions, neighbours[offers[neighbours]][:3])
+        assert set(graph.offered(position)) == {
+            column for column in ALTERNATIVE_SERVICES.values() if flag_mask(facilities, column)[position]
+        }
+
+
+def test_bound_to_a_changed_dataset(facilities, graph_path):
+    full = load_proximity_graph(facilities, graph_path)
+    changed = pd.concat([facilities.iloc[100:], facilities.iloc[:1].assign(**{FACILITY_ID_COLUMN: "brand-new"})])
+    graph = load_proximity_graph(changed, graph_path)
+
+    assert len(graph) == len(changed)
+    # The new facility has no neighbours until the graph is rebuilt
+    assert len(graph.neighbours(len(changed) - 1)[0]) == 0
+    ids = changed[FACILITY_ID_COLUMN].to_numpy()
+    for position in range(0, len(changed) - 1, 29):
+        kept = [i for i in facilities[FACILITY_ID_COLUMN].to_numpy()[full.neighbours(position + 100)[0]]
+                if i in set(ids)]
+        assert ids[graph.neighbours(position)[0]].tolist() == kept
+
+
+def test_duplicate_ids_are_bound_as_one_facility(facilities, tmp_path):
+    # Identical CSV rows share a fallback id
+    duplicated = pd.concat([facilities, facilities.iloc[:20], facilities.iloc[:5]])
+    graph = load_proximity_graph(duplicated, _build(duplicated, tmp_path))
+
+    ids = duplicated[FACILITY_ID_COLUMN].to_numpy()
+    assert len(graph) == len(duplicated)
+    for position in range(len(duplicated)):
+        assert ids[position] not in ids[graph.neighbours(position)[0]]
+    for copy in range(len(facilities), len(duplicated)):
+        original = np.flatnonzero(ids == ids[copy])[0]
+        np.testing.assert_array_equal(graph.neighbours(copy)[0], graph.neighbours(original)[0])
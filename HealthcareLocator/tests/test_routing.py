@@ -0,0 +1,79 @@
+"""routing: a road graph built from a tiny OSM extract, routed per mode."""
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from routing import RoadGraph, SPEEDS_KMH, build_road_graph, load_road_graph, rank_by_travel_time
+
+# Nodes 1-2-3 on a two-way residential street, 3->4 a one-way primary road,
+# 4-5 a footway; node 99 is referenced but lies outside the extract.
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="6.0" lon="3.00"/>
+  <node id="2" lat="6.0" lon="3.01"/>
+  <node id="3" lat="6.0" lon="3.02"/>
+  <node id="4" lat="6.0" lon="3.03"/>
+  <node id="5" lat="6.01" lon="3.03"/>
+  <way id="10"><nd ref="1"/><nd ref="2"/><nd ref="3"/><tag k="highway" v="residential"/></way>
+  <way id="11"><nd ref="3"/><nd ref="4"/><tag k="highway" v="primary"/><tag k="oneway" v="yes"/></way>
+  <way id="12"><nd ref="4"/><nd ref="5"/><nd ref="99"/><tag k="highway" v="footway"/></way>
+  <way id="13"><nd ref="1"/><nd ref="5"/><tag k="building" v="yes"/></way>
+</osm>
+"""
+
+NODE_1, NODE_2, NODE_4, NODE_5 = (6.0, 3.00), (6.0, 3.01), (6.0, 3.03), (6.01, 3.03)
+
+
+@pytest.fixture(scope="module")
+def graph(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("roads")
+    (directory / "extract.osm").write_text(OSM)
+    build_road_graph(str(directory / "extract.osm"), str(directory / "graph.npz"))
+    return load_road_graph(str(directory / "graph.npz"))
+
+
+def test_build_keeps_routable_located_nodes(graph):
+    assert len(graph) == 5
+    # Two directed edges per segment: 1-2, 2-3, 3-4, 4-5
+    assert len(graph.indices) == 8
+
+
+def test_one_way_roads(graph):
+    assert graph.route(NODE_1, NODE_4, "driving") is not None
+    assert graph.route(NODE_4, NODE_1, "driving") is None
+    assert graph.route(NODE_4, NODE_1, "walking") is not None
+
+
+def test_route_time_and_length(graph):
+    route = graph.route(NODE_1, NODE_2, "driving")
+    assert route.meters == pytest.approx(1105.7, rel=1e-3)
+    assert route.seconds == pytest.approx(route.meters / (SPEEDS_KMH['driving']['residential'] / 3.6), rel=1e-3)
+    assert route.path[0] == NODE_1 and route.path[-1] == NODE_2
+
+
+def test_travel_times_agree_with_routes(graph):
+    seconds = graph.travel_times(NODE_1, [NODE_4, NODE_5, (9.0, 8.0)], "driving")
+
+    assert seconds[0] == pytest.approx(graph.route(NODE_1, NODE_4, "driving").seconds)
+    # Footway only, and too far from any road
+    assert math.isinf(seconds[1]) and math.isinf(seconds[2])
+    # Served from the cache the second time
+    np.testing.assert_array_equal(graph.travel_times(NODE_1, [NODE_4, NODE_5, (9.0, 8.0)], "driving"), seconds)
+
+
+def test_rank_by_travel_time(graph):
+    candidates = pd.DataFrame({'facility_name': ["far", "footway", "near"], 'latitude': [6.0, 6.01, 6.0],
+                               'longitude': [3.03, 3.03, 3.01]})
+    ranked = rank_by_travel_time(graph, candidates, *NODE_1, mode="driving", k=3)
+
+    assert ranked['facility_name'].tolist() == ["near", "far", "footway"]
+    assert math.isinf(ranked['travel_min'].iloc[-1])
+
+
+def test_modes_cannot_use_unlisted_roads():
+    # A single motorway edge, which walking may not use
+    graph = RoadGraph([6.0, 6.0], [3.0, 3.01], [0, 1, 2], [1, 0], [1000.0, 1000.0], [0, 0], [False, False])
+    assert graph.route((6.0, 3.0), (6.0, 3.01), "driving") is not None
+    assert graph.route((6.0, 3.0), (6.0, 3.01), "walking") is None
@@ -0,0 +1,60 @@
+"""search_index.TextSearchIndex matches utils.search_mask, built fresh or incrementally."""
+import numpy as np
+import pytest
+
+from search_index import build_search_index
+from utils import search_mask
+
+SEARCH_TERMS = ["mercy", "  Unity ", "MODEL General", "ik", "a", "obio/", "100%", "e_c", "lagos", "no such facility"]
+
+
+def _expected(df, term, positions=None):
+    positions = np.arange(len(df)) if positions is None else positions
+    return positions[search_mask(df, term, positions)]
+
+
+@pytest.fixture(scope="module")
+def index(facilities):
+    return build_search_index(facilities)
+
+
+@pytest.mark.parametrize("term", SEARCH_TERMS)
+def test_search_matches_search_mask(facilities, index, term):
+    np.testing.assert_array_equal(index.search(term), _expected(facilities, term))
+
+
+@pytest.mark.parametrize("term", SEARCH_TERMS)
+def test_candidates_and_refine(facilities, index, term):
+    candidates = np.flatnonzero((facilities['State'] == "Rivers").to_numpy())
+    expected = _expected(facilities, term, candidates)
+
+    np.testing.assert_array_equal(index.search(term, candidates=candidates), expected)
+    np.testing.assert_array_equal(index.refine(term, candidates), expected)
+
+
+def test_blank_term_matches_everything(facilities, index):
+    np.testing.assert_array_equal(index.search("   "), np.arange(len(facilities)))
+
+
+def test_ranked_puts_name_prefixes_first(facilities, index):
+    ranked = index.search("mercy", ranked=True)
+    names = facilities['facility_name'].iloc[ranked].str.lower()
+
+    assert set(ranked) == set(index.search("mercy"))
+    starts = names.str.startswith("mercy").to_numpy()
+    assert starts.any() and not np.any(np.diff(starts.astype(int)) > 0)
+
+
+def test_fuzzy_falls_back_to_trigram_overlap(index):
+    assert not len(index.search("mercyy"))
+    assert set(index.search("mercy")) <= set(index.search("mercyy", fuzzy=True))
+
+
+@pytest.mark.parametrize("term", SEARCH_TERMS)
+def test_incremental_build_matches_fresh(facilities, index, term):
+    changed = facilities.iloc[50:].copy()
+    changed.loc[changed.index[:20], 'facility_name'] = "Brand New Clinic"
+
+    np.testing.assert_array_equal(
+        build_search_index(changed, previous=index).search(term), build_search_index(changed).search(term)
+    )
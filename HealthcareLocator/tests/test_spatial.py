@@ -0,0 +1,62 @@
+"""spatial.SpatialIndex checked against a brute-force haversine scan."""
+import numpy as np
+import pytest
+
+from spatial import SpatialIndex, build_spatial_index, haversine_km, nearest_facilities
+
+QUERIES = [(6.5, 3.4), (9.0, 8.5), (4.0, 15.0), (13.55, 3.05), (20.0, -5.0)]
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(3)
+    return rng.uniform(4.0, 14.0, 2000), rng.uniform(2.5, 14.5, 2000)
+
+
+def _brute_force(points, lat, lon):
+    return haversine_km(lat, lon, *points)
+
+
+def test_haversine_known_distance():
+    # One degree of latitude along a meridian
+    assert haversine_km(0.0, 0.0, 1.0, 0.0) == pytest.approx(111.195, rel=1e-4)
+    assert haversine_km(6.5, 3.4, 6.5, 3.4) == 0.0
+
+
+@pytest.mark.parametrize("lat, lon", QUERIES)
+@pytest.mark.parametrize("k", [1, 10, 2000, 5000])
+def test_nearest_matches_brute_force(points, lat, lon, k):
+    positions, distances = SpatialIndex(*points).nearest(lat, lon, k)
+    expected = np.sort(_brute_force(points, lat, lon))[:k]
+
+    assert len(positions) == min(k, 2000)
+    np.testing.assert_allclose(distances, expected)
+    np.testing.assert_allclose(_brute_force(points, lat, lon)[positions], distances)
+
+
+@pytest.mark.parametrize("lat, lon", QUERIES)
+@pytest.mark.parametrize("radius_km", [0.5, 25.0, 300.0])
+@pytest.mark.parametrize("cell_size_deg", [0.01, 0.1, 1.0])
+def test_within_radius_matches_brute_force(points, lat, lon, radius_km, cell_size_deg):
+    positions, distances = SpatialIndex(*points, cell_size_deg).within_radius(lat, lon, radius_km)
+    all_distances = _brute_force(points, lat, lon)
+
+    assert set(positions) == set(np.flatnonzero(all_distances <= radius_km))
+    assert np.all(np.diff(distances) >= 0)
+    np.testing.assert_allclose(all_distances[positions], distances)
+
+
+def test_empty_index():
+    index = SpatialIndex([], [])
+    positions, distances = index.nearest(6.5, 3.4, 5)
+    assert len(positions) == 0 and len(distances) == 0
+    assert len(index.within_radius(6.5, 3.4, 100.0)[0]) == 0
+
+
+def test_nearest_facilities_frame(facilities):
+    index = build_spatial_index(facilities)
+    nearest = nearest_facilities(facilities, index, 9.0, 8.5, k=5)
+    within = nearest_facilities(facilities, index, 9.0, 8.5, radius_km=nearest['distance_km'].iloc[-1])
+
+    assert len(nearest) == 5 and nearest['distance_km'].is_monotonic_increasing
+    assert set(nearest.index) <= set(within.index)
@@ -0,0 +1,40 @@
+"""stats_cube: statistics summed from the cube equal get_facility_stats on the filtered rows."""
+import pytest
+
+from stats_cube import build_stats_cube, cube_facility_stats, update_stats_cube
+from utils import _filter_positions, get_facility_stats
+
+FILTERS = [
+    {},
+    {'facility_type': "Dispensary"},
+    {'services': ["Emergency Transport", "Malaria Treatment"]},
+    {'state': "Kano"},
+    {'state': "Lagos", 'lga': "Epe", 'services': ["Family Planning"]},
+    {'state': "Lagos", 'lga': "Dala"},
+]
+
+
+def _expected(df, filters):
+    stats = get_facility_stats(df.iloc[_filter_positions(df, **filters)])
+    # value_counts lists every category of the column, including empty ones
+    stats['facility_types'] = {name: n for name, n in stats['facility_types'].items() if n}
+    return stats
+
+
+def _comparable(stats):
+    return {key: value if key == 'facility_types' else int(value) for key, value in stats.items()}
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_cube_matches_row_stats(facilities, filters):
+    cube = build_stats_cube(facilities)
+    assert _comparable(cube_facility_stats(cube, **filters)) == _comparable(_expected(facilities, filters))
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_updated_cube_matches_rebuilt(facilities, filters):
+    old, new = facilities.iloc[:400], facilities.iloc[100:]
+    cube = update_stats_cube(build_stats_cube(old), facilities.iloc[:100], facilities.iloc[400:])
+
+    assert _comparable(cube_facility_stats(cube, **filters)) == _comparable(_expected(new, filters))
+    assert cube['facilities'].sum() == len(new)
@@ -1,10 +1,49 @@
+import os
 import pandas as pd
 import numpy as np
-
+from metrics import timed
+
+# Where facility queries run: "pandas" (in-process frame) or "postgis" (see postgis_backend.py)
+FACILITY_BACKEND = os.getenv("FACILITY_BACKEND", "pandas").lower()
+
+# Yes/no service columns in Hospitals.csv
+BOOL_COLUMNS = [
+    'maternal_health_delivery_services',
+    'emergency_transport',
+    'skilled_birth_attendant',
+    'phcn_electricity',
+    'c_section_yn',
+    'improved_water_supply',
+    'improved_sanitation',
+    'vaccines_fridge_freezer',
+    'antenatal_care_yn',
+    'family_planning_yn',
+    'malaria_treatment_artemisinin'
+]
+
+# Sidebar service labels and the columns they filter on
+SERVICE_COLUMNS = {
+    "Maternal Health": 'maternal_health_delivery_services',
+    "Emergency Transport": 'emergency_transport',
+    "Family Planning": 'family_planning_yn',
+    "Malaria Treatment": 'malaria_treatment_artemisinin'
+}
+
+# Columns matched by the free-text search box
+SEARCH_COLUMNS = ['facility_name', 'State', 'Local_Government_Area']
+
+# Stable facility identifier; derived from name, location and coordinates
+# for rows (or whole files) that do not carry one
+FACILITY_ID_COLUMN = 'facility_id'
+FACILITY_KEY_COLUMNS = ['facility_name', 'State', 'Local_Government_Area', 'latitude', 'longitude']
+
+@timed("load_and_clean_data")
 def load_and_clean_data(file_path):
     """Load and clean the hospitals dataset."""
-    df = pd.read_csv(file_path)
+    return clean_facility_chunk(pd.read_csv(file_path))
 
+def clean_facility_chunk(df):
+    """Apply the cleaning rules to a frame of raw CSV rows (whole file or one chunk)."""
     # Convert GPS coordinates to float
     df['latitude'] = pd.to_numeric(df['latitude'], errors='coerce')
     df['longitude'] = pd.to_numeric(df['longitude'], errors='coerce')
@@ -15,28 +54,55 @@ def load_and_clean_data(file_path):
         (df['longitude'].notna()) &
         (df['latitude'] != 0) & 
         (df['longitude'] != 0)
-    ]
+    ].copy()
 
     # Clean boolean columns
-    bool_columns = [
-        'maternal_health_delivery_services',
-        'emergency_transport',
-        'skilled_birth_attendant',
-        'phcn_electricity',
-        'c_section_yn',
-        'improved_water_supply',
-        'improved_sanitation',
-        'vaccines_fridge_freezer',
-        'antenatal_care_yn',
-        'family_planning_yn',
-        'malaria_treatment_artemisinin'
-    ]
-
-    for col in bool_columns:
-        df[col] = df[col].map({'TRUE': True, 'FALSE': False})
+    for col in BOOL_COLUMNS:
+        df[col] = parse_flags(df[col])
 
+    df[FACILITY_ID_COLUMN] = facility_ids(df)
     return df
 
+def parse_flags(series):
+    """A yes/no column as nullable booleans; blanks and unknown values become <NA>.
+
+    read_csv already turns columns holding only TRUE/FALSE into bools, while
+    columns with blanks arrive as text or mixed objects, so both are accepted.
+    """
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype('boolean')
+    text = series.astype('string').str.strip().str.upper()
+    return text.map({'TRUE': True, 'FALSE': False}).astype('boolean')
+
+def flag_mask(df, column):
+    """A yes/no column as a plain bool array; unknown counts as no."""
+    return (df[column] == True).to_numpy(dtype=bool, na_value=False)
+
+def pack_flags(df, columns, dtype=np.int64):
+    """Yes/no columns packed into one integer per row (bit i is the i-th column)."""
+    bits = np.zeros(len(df), dtype=dtype)
+    for bit, column in enumerate(columns):
+        bits |= flag_mask(df, column).astype(dtype) << bit
+    return bits
+
+def required_bits(columns, wanted):
+    """Bitmask of the wanted entries of columns, in pack_flags order."""
+    return sum(1 << bit for bit, column in enumerate(columns) if column in wanted)
+
+def concat_ranges(starts, lengths):
+    """Concatenated ranges [start, start + length) without a Python loop."""
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+def facility_ids(df):
+    """Facility ids from the CSV, falling back to a hash of the row's identifying columns."""
+    derived = 'h' + pd.util.hash_pandas_object(df[FACILITY_KEY_COLUMNS], index=False).astype(str)
+    if FACILITY_ID_COLUMN not in df.columns:
+        return derived
+    ids = df[FACILITY_ID_COLUMN].astype('string')
+    return ids.where(ids.notna() & (ids.str.strip() != ''), derived).astype(str)
+
+@timed("get_facility_stats")
 def get_facility_stats(df):
     """Calculate basic statistics about healthcare facilities."""
     stats = {
@@ -50,49 +116,134 @@ def get_facility_stats(df):
     }
     return stats
 
-def get_location_options(df):
-    """Get unique states and their corresponding LGAs."""
-    # Get unique states
-    states = sorted(df['State'].unique())
-
-    # Create a dictionary of state to LGAs
-    state_to_lgas = {
-        state: sorted(df[df['State'] == state]['Local_Government_Area'].unique())
-        for state in states
-    }
-
-    return states, state_to_lgas
+class LocationHierarchy:
+    """States, their LGAs and facility counts per node.
+
+    Built from facility counts indexed by (State, LGA), which
+    build_location_hierarchy computes in one grouped pass.
+    """
+
+    def __init__(self, counts):
+        counts = counts[counts > 0]
+
+        self.total = int(counts.sum())
+        self.lga_counts = {key: int(n) for key, n in counts.items()}
+        self.state_counts = {}
+        self.state_to_lgas = {}
+        for state, lga in sorted(self.lga_counts):
+            self.state_counts[state] = self.state_counts.get(state, 0) + self.lga_counts[(state, lga)]
+            self.state_to_lgas.setdefault(state, []).append(lga)
+        self.states = sorted(self.state_to_lgas)
+
+    def lgas(self, state):
+        """Sorted LGAs of a state."""
+        return self.state_to_lgas.get(state, [])
+
+    def count(self, state=None, lga=None):
+        """Facilities in a state, an LGA of that state, or overall."""
+        if state is None:
+            return self.total
+        if lga is None:
+            return self.state_counts.get(state, 0)
+        return self.lga_counts.get((state, lga), 0)
+
+def _location_counts(df):
+    return df.groupby(['State', 'Local_Government_Area'], observed=True).size()
+
+def build_location_hierarchy(df):
+    """Build the state -> LGA hierarchy of the cleaned dataset."""
+    return LocationHierarchy(_location_counts(df))
+
+def update_location_hierarchy(hierarchy, removed, added):
+    """The hierarchy after removing the rows of ``removed`` and adding those of ``added``."""
+    counts = dict(hierarchy.lga_counts)
+    for key, n in _location_counts(removed).items():
+        counts[key] = counts.get(key, 0) - int(n)
+    for key, n in _location_counts(added).items():
+        counts[key] = counts.get(key, 0) + int(n)
+    return LocationHierarchy(pd.Series(counts, dtype="int64"))
+
+@timed("filter_facilities")
+def filter_facilities(df=None, facility_type=None, services=None, search_term=None, state=None, lga=None,
+                      index=None, version=None, bounds=None, limit=None):
+    """Filter facilities based on type, services, search term, state, and LGA.
+
+    With a prebuilt FilterIndex (see filter_index.py) the structural filters
+    are answered from its bitsets, the search term from its trigram index,
+    and the frame is materialized once. Passing the dataset ``version`` as
+    well serves repeated filters from the process-wide result cache (see
+    filter_cache.py). ``bounds`` (st_folium format) keeps the facilities in a
+    map viewport and ``limit`` caps the rows returned.
+
+    With FACILITY_BACKEND=postgis the query runs in Postgres instead (see
+    postgis_backend.py, same signature) and ``df``, ``index`` and
+    ``version`` are ignored.
+    """
+    if FACILITY_BACKEND == "postgis":
+        import postgis_backend
+        return postgis_backend.filter_facilities(
+            df, facility_type, services, search_term, state, lga, index, version, bounds, limit
+        )
 
-def filter_facilities(df, facility_type=None, services=None, search_term=None, state=None, lga=None):
-    """Filter facilities based on type, services, search term, state, and LGA."""
-    filtered_df = df.copy()
+    if index is not None:
+        if version is not None:
+            from filter_cache import filter_positions
+            positions = filter_positions(index, version, facility_type, services, search_term, state, lga)
+        else:
+            positions = index.positions(facility_type, services, state, lga)
+            if search_term:
+                positions = index.text.search(search_term, candidates=positions)
+    else:
+        positions = _filter_positions(df, facility_type, services, search_term, state, lga)
+
+    if bounds:
+        positions = positions[_in_bounds(df, positions, bounds)]
+    if limit:
+        positions = positions[:limit]
+    # Positions are sorted and unique, so matching every row means no filter applied
+    return df if len(positions) == len(df) else df.iloc[positions]
+
+def _filter_positions(df, facility_type=None, services=None, search_term=None, state=None, lga=None):
+    mask = np.ones(len(df), dtype=bool)
 
     if facility_type and facility_type != "All":
-        filtered_df = filtered_df[filtered_df['facility_type_display'] == facility_type]
+        mask &= (df['facility_type_display'] == facility_type).to_numpy()
 
     if services:
         for service in services:
-            if service == "Maternal Health":
-                filtered_df = filtered_df[filtered_df['maternal_health_delivery_services'] == True]
-            elif service == "Emergency Transport":
-                filtered_df = filtered_df[filtered_df['emergency_transport'] == True]
-            elif service == "Family Planning":
-                filtered_df = filtered_df[filtered_df['family_planning_yn'] == True]
-            elif service == "Malaria Treatment":
-                filtered_df = filtered_df[filtered_df['malaria_treatment_artemisinin'] == True]
+            column = SERVICE_COLUMNS.get(service)
+            if column:
+                mask &= flag_mask(df, column)
 
     if state:
-        filtered_df = filtered_df[filtered_df['State'] == state]
+        mask &= (df['State'] == state).to_numpy()
 
     if lga:
-        filtered_df = filtered_df[filtered_df['Local_Government_Area'] == lga]
-
-    if search_term:
-        search_mask = (
-            filtered_df['facility_name'].str.contains(search_term, case=False, na=False) |
-            filtered_df['State'].str.contains(search_term, case=False, na=False) |
-            filtered_df['Local_Government_Area'].str.contains(search_term, case=False, na=False)
-        )
-        filtered_df = filtered_df[search_mask]
-
-    return filtered_df
\ No newline at end of file
+        mask &= (df['Local_Government_Area'] == lga).to_numpy()
+
+    positions = np.flatnonzero(mask)
+    if search_term and search_term.strip():
+        positions = positions[search_mask(df, search_term, positions)]
+    return positions
+
+def _in_bounds(df, positions, bounds):
+    """Mask of the given rows inside a map viewport (st_folium bounds)."""
+    south, west = bounds['_southWest']['lat'], bounds['_southWest']['lng']
+    north, east = bounds['_northEast']['lat'], bounds['_northEast']['lng']
+    lat = df['latitude'].to_numpy()[positions]
+    lon = df['longitude'].to_numpy()[positions]
+    return (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+
+def search_mask(df, search_term, positions):
+    """Case-insensitive substring match of name, state or LGA for the given rows.
+
+    Surrounding whitespace is ignored. The TextSearchIndex (search_index.py)
+    and the PostGIS backend match the same rows.
+    """
+    search_term = search_term.strip()
+    mask = np.zeros(len(positions), dtype=bool)
+    for col in SEARCH_COLUMNS:
+        mask |= df[col].iloc[positions].str.contains(
+            search_term, case=False, na=False, regex=False
+        ).to_numpy(dtype=bool)
+    return mask